@@ -1,5 +1,11 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from . import auth, instrumentation, sqlite  # noqa: F401
+        if settings.PROFILING_INSTRUMENTATION:
+            instrumentation.install()
@@ -0,0 +1,78 @@
+"""Пользователь сессии из кэша вместо запроса к базе на каждый запрос.
+
+``AuthenticationMiddleware`` загружает ``request.user`` по id из сессии.
+``CachedModelBackend`` держит этого пользователя в кэше
+``AUTH_USER_CACHE_TIMEOUT`` секунд; любое сохранение или удаление
+пользователя, включая смену пароля и ``last_login``, сбрасывает запись.
+Внутри транзакции запись сбрасывается ещё раз после коммита: иначе
+конкурентный запрос успел бы положить в кэш прежнюю строку.
+
+Хеш пароля в общий кэш не попадает: хранятся остальные поля и готовый
+хеш для проверки сессии. Пароль у восстановленного пользователя
+отложен, как после ``defer('password')``: он читается из базы при
+обращении, а ``save()`` его не перезаписывает.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connection, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+User = get_user_model()
+
+USER_KEY = 'auth:user:{}'
+SECRET_FIELDS = ('password',)
+
+
+def dump_user(user):
+    """Поля пользователя для кэша: всё, кроме хеша пароля."""
+    return {
+        'fields': [
+            getattr(user, field.attname)
+            for field in _cached_fields()
+        ],
+        'session_hash': user.get_session_auth_hash(),
+    }
+
+
+def load_user(data):
+    fields = _cached_fields()
+    user = User.from_db(
+        DEFAULT_DB_ALIAS, [field.attname for field in fields], data['fields']
+    )
+    session_hash = data['session_hash']
+    # Без этого проверка сессии прочитала бы отложенный пароль из базы.
+    user.get_session_auth_hash = lambda: session_hash
+    return user
+
+
+def _cached_fields():
+    return [
+        field for field in User._meta.concrete_fields
+        if field.name not in SECRET_FIELDS
+    ]
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        key = USER_KEY.format(user_id)
+        data = cache.get(key)
+        if data is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(key, dump_user(user), settings.AUTH_USER_CACHE_TIMEOUT)
+        else:
+            user = load_user(data)
+        return user if self.user_can_authenticate(user) else None
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    key = USER_KEY.format(instance.pk)
+    cache.delete(key)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: cache.delete(key))
@@ -0,0 +1,186 @@
+"""Замеры стоимости запроса: SQL, рендеринг шаблонов, кеш и CPU.
+
+``collect()`` открывает замер для текущего потока. SQL считается через
+``execute_wrapper`` каждого соединения, шаблоны через обёртку над
+``Template.render``, кеш через обёртки над ``get``/``get_many`` классов
+настроенных кешей. Вложенные вызовы (``include``, ``extends``,
+``get_many`` поверх ``get``) не суммируются дважды: учитывается только
+самый внешний. Замеры могут быть вложены друг в друга, тогда каждый из них
+видит всё, что произошло внутри него.
+Обёртки над шаблонами и кешами меняют классы на весь процесс, поэтому
+ставятся один раз в ``CoreConfig.ready`` при
+``PROFILING_INSTRUMENTATION``; без них замер видит SQL, CPU и общее время.
+Точки сохранения транзакций не считаются запросами: в тестах их добавляет
+обёртка ``TestCase``, а не сама страница.
+"""
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.template.base import Template
+
+_local = threading.local()
+_install_lock = threading.Lock()
+_installed = False
+_missing = object()
+
+SAVEPOINT_PREFIXES = (
+    'SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT',
+)
+
+
+class Measurement:
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.render_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_time = 0.0
+        self.cpu_time = 0.0
+        self.total_time = 0.0
+
+    def __repr__(self):
+        return (
+            f'<Measurement queries={self.queries} '
+            f'sql={self.sql_time * 1000:.1f}ms '
+            f'render={self.render_time * 1000:.1f}ms '
+            f'cache={self.cache_hits}/{self.cache_misses} '
+            f'total={self.total_time * 1000:.1f}ms>'
+        )
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.startswith(SAVEPOINT_PREFIXES):
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_time += time.perf_counter() - start
+
+    def as_dict(self):
+        return {
+            'queries': self.queries,
+            'sql_ms': round(self.sql_time * 1000, 2),
+            'render_ms': round(self.render_time * 1000, 2),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'cache_ms': round(self.cache_time * 1000, 2),
+            'cpu_ms': round(self.cpu_time * 1000, 2),
+            'total_ms': round(self.total_time * 1000, 2),
+        }
+
+
+def _stack():
+    return _local.__dict__.setdefault('stack', [])
+
+
+def current():
+    """Самый внутренний активный замер текущего потока или None."""
+    stack = _stack()
+    return stack[-1] if stack else None
+
+
+@contextmanager
+def _outermost(kind):
+    """Отдаёт активные замеры, если это не вложенный вызов того же рода."""
+    depth = _local.__dict__.setdefault(kind, 0)
+    _local.__dict__[kind] = depth + 1
+    try:
+        yield [] if depth else list(_stack())
+    finally:
+        _local.__dict__[kind] = depth
+
+
+def _wrap_render(original):
+    @wraps(original)
+    def render(self, context):
+        with _outermost('render_depth') as measurements:
+            if not measurements:
+                return original(self, context)
+            start = time.perf_counter()
+            try:
+                return original(self, context)
+            finally:
+                elapsed = time.perf_counter() - start
+                for measurement in measurements:
+                    measurement.render_time += elapsed
+    return render
+
+
+def _record_cache(measurements, start, hits, misses):
+    elapsed = time.perf_counter() - start
+    for measurement in measurements:
+        measurement.cache_time += elapsed
+        measurement.cache_hits += hits
+        measurement.cache_misses += misses
+
+
+def _wrap_cache_get(original):
+    @wraps(original)
+    def get(self, key, default=None, version=None):
+        with _outermost('cache_depth') as measurements:
+            if not measurements:
+                return original(self, key, default, version)
+            start = time.perf_counter()
+            value = original(self, key, _missing, version)
+            hit = value is not _missing
+            _record_cache(measurements, start, int(hit), int(not hit))
+            return value if hit else default
+    return get
+
+
+def _wrap_cache_get_many(original):
+    @wraps(original)
+    def get_many(self, keys, version=None):
+        with _outermost('cache_depth') as measurements:
+            if not measurements:
+                return original(self, keys, version)
+            keys = list(keys)
+            start = time.perf_counter()
+            values = original(self, keys, version)
+            _record_cache(
+                measurements, start, len(values), len(keys) - len(values)
+            )
+            return values
+    return get_many
+
+
+def install():
+    """Ставит обёртки над шаблонами и кешами один раз за процесс."""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        Template.render = _wrap_render(Template.render)
+        backends = {caches[alias].__class__ for alias in settings.CACHES}
+        for backend in backends:
+            backend.get = _wrap_cache_get(backend.get)
+            backend.get_many = _wrap_cache_get_many(backend.get_many)
+        _installed = True
+
+
+@contextmanager
+def collect():
+    """Замер всего, что выполнится внутри блока в этом потоке."""
+    measurement = Measurement()
+    stack = _stack()
+    stack.append(measurement)
+    start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        with ExitStack() as wrappers:
+            for connection in connections.all():
+                wrappers.enter_context(
+                    connection.execute_wrapper(measurement)
+                )
+            yield measurement
+    finally:
+        measurement.cpu_time = time.thread_time() - cpu_start
+        measurement.total_time = time.perf_counter() - start
+        stack.remove(measurement)
@@ -0,0 +1,17 @@
+"""Блокировка таблицы до конца текущей транзакции."""
+from django.db import connection
+
+
+def lock_table(model):
+    """Не даёт другим транзакциям писать в таблицу модели до коммита.
+
+    PostgreSQL блокирует таблицу явно; SQLite берёт блокировку записи
+    всей базы на первой пишущей команде, поэтому хватает пустого
+    ``UPDATE``.
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'LOCK TABLE {table} IN EXCLUSIVE MODE')
+        else:
+            cursor.execute(f'UPDATE {table} SET id = id WHERE 1 = 0')
@@ -0,0 +1,105 @@
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+# Размер типичного закэшированного фрагмента ленты.
+FRAGMENT = 'x' * 4096
+
+
+def worker(args):
+    """Процесс-воркер: читает горячие ключи, на промахе «рендерит».
+
+    Ключи выбираются по закону Ципфа, как популярные страницы ленты.
+    Возвращает число попаданий, промахов и задержки ``get`` в мс.
+    """
+    backend, location, keys, operations, render_ms, seed = args
+    # Кэш вмещает все ключи: сравниваем разделение, а не вытеснение.
+    cache = import_string(backend)(location, {
+        'TIMEOUT': 300, 'OPTIONS': {'MAX_ENTRIES': keys * 2},
+    })
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, keys + 1)]
+    hits = misses = 0
+    latencies = []
+    for key in rng.choices(range(keys), weights, k=operations):
+        start = time.perf_counter()
+        value = cache.get(f'fragment:{key}')
+        latencies.append((time.perf_counter() - start) * 1000)
+        if value is None:
+            misses += 1
+            time.sleep(render_ms / 1000)
+            cache.set(f'fragment:{key}', FRAGMENT)
+        else:
+            hits += 1
+    return hits, misses, latencies
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает долю попаданий и задержку кэша у LocMemCache и общего '
+        'кэша при нескольких процессах-воркерах.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--keys', type=int, default=500)
+        parser.add_argument('--operations', type=int, default=5000)
+        parser.add_argument(
+            '--render-ms', type=float, default=1,
+            help='Цена промаха: сколько «рендерится» фрагмент.',
+        )
+        parser.add_argument(
+            '--memcached', metavar='HOST:PORT',
+            help='Добавить в сравнение memcached по этому адресу.',
+        )
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp()
+        backends = [
+            ('locmem', 'django.core.cache.backends.locmem.LocMemCache',
+             'benchmark'),
+            ('sqlite', 'core.cache.SQLiteCache',
+             os.path.join(directory, 'cache.sqlite3')),
+        ]
+        if options['memcached']:
+            backends.append((
+                'memcached',
+                'django.core.cache.backends.memcached.MemcachedCache',
+                options['memcached'],
+            ))
+        self.stdout.write(
+            f'{"кэш":<12}{"попаданий":>11}{"get p50":>10}{"get p95":>10}'
+            f'{"время":>9}'
+        )
+        context = multiprocessing.get_context('spawn')
+        try:
+            for name, backend, location in backends:
+                tasks = [
+                    (backend, location, options['keys'],
+                     options['operations'], options['render_ms'], seed)
+                    for seed in range(options['workers'])
+                ]
+                started = time.perf_counter()
+                with context.Pool(options['workers']) as pool:
+                    results = pool.map(worker, tasks)
+                elapsed = time.perf_counter() - started
+                hits = sum(result[0] for result in results)
+                total = hits + sum(result[1] for result in results)
+                latencies = sorted(
+                    ms for result in results for ms in result[2]
+                )
+                p95 = latencies[int(len(latencies) * 0.95)]
+                self.stdout.write(
+                    f'{name:<12}{hits / total:>11.1%}'
+                    f'{statistics.median(latencies):>8.3f}мс'
+                    f'{p95:>8.3f}мс{elapsed:>8.1f}с'
+                )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
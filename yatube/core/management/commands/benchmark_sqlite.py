@@ -0,0 +1,144 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.sqlite import apply_pragmas
+
+SCHEMA = (
+    'CREATE TABLE post (id INTEGER PRIMARY KEY, author_id INTEGER, '
+    'text TEXT, pub_date REAL)',
+    'CREATE INDEX post_pub_date ON post (pub_date, id)',
+    'CREATE TABLE counters (id INTEGER PRIMARY KEY, posts INTEGER)',
+    'INSERT INTO counters VALUES (1, 0)',
+)
+WRITE = (
+    'INSERT INTO post (author_id, text, pub_date) VALUES (?, ?, ?)',
+    'UPDATE counters SET posts = posts + 1 WHERE id = 1',
+)
+READ = 'SELECT id, text FROM post ORDER BY pub_date DESC, id DESC LIMIT 10'
+
+
+def prepare(path, rows):
+    db = sqlite3.connect(path)
+    for statement in SCHEMA:
+        db.execute(statement)
+    db.executemany(WRITE[0], (
+        (i % 50, f'Пост {i}', time.time()) for i in range(rows)
+    ))
+    db.commit()
+    db.close()
+
+
+def connect(path, pragmas):
+    db = sqlite3.connect(path, isolation_level=None)
+    apply_pragmas(db, pragmas)
+    return db
+
+
+def operation(db, kind):
+    """Одна операция; возвращает ключ счётчика: вид или вид с ошибкой."""
+    try:
+        if kind == 'read':
+            db.execute(READ).fetchall()
+            return kind
+        db.execute('BEGIN')
+        try:
+            db.execute(WRITE[0], (1, 'Новый пост', time.time()))
+            db.execute(WRITE[1])
+            db.execute('COMMIT')
+        except sqlite3.OperationalError:
+            db.execute('ROLLBACK')
+            raise
+    except sqlite3.OperationalError:
+        return f'{kind}_errors'
+    return kind
+
+
+def worker(path, pragmas, persistent, kind, deadline):
+    done = Counter()
+    db = connect(path, pragmas) if persistent else None
+    while time.monotonic() < deadline:
+        if db is not None:
+            done[operation(db, kind)] += 1
+            continue
+        current = connect(path, pragmas)
+        try:
+            done[operation(current, kind)] += 1
+        finally:
+            current.close()
+    if db is not None:
+        db.close()
+    return done
+
+
+def run_profile(path, pragmas, persistent, writers, readers, seconds):
+    """Гоняет писателей и читателей; возвращает счётчики операций.
+
+    Без ``persistent`` соединение открывается на каждую операцию, как при
+    ``CONN_MAX_AGE = 0``, где каждый запрос заново подключается к базе.
+    """
+    deadline = time.monotonic() + seconds
+    kinds = ['write'] * writers + ['read'] * readers
+    with ThreadPoolExecutor(max_workers=len(kinds)) as pool:
+        results = pool.map(
+            lambda kind: worker(path, pragmas, persistent, kind, deadline),
+            kinds,
+        )
+    return sum(results, Counter())
+
+
+def benchmark(pragmas, persistent, options):
+    """Прогон профиля на свежей базе во временном каталоге."""
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'bench.sqlite3')
+        prepare(path, options['rows'])
+        return run_profile(
+            path, pragmas, persistent,
+            options['writers'], options['readers'], options['seconds'],
+        )
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность SQLite с настройками по '
+        'умолчанию и с SQLITE_PRAGMAS и постоянными соединениями.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--rows', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        if not settings.SQLITE_PRAGMAS:
+            raise CommandError(
+                'SQLITE_PRAGMAS пуст: запустите с '
+                '--settings=yatube.settings_production.'
+            )
+        profiles = (
+            ('default', {}, False),
+            ('production', settings.SQLITE_PRAGMAS, True),
+        )
+        seconds = options['seconds']
+        self.stdout.write(
+            f'{"профиль":<12}{"записей/с":>12}{"чтений/с":>12}'
+            f'{"ошибок":>9}'
+        )
+        for name, pragmas, persistent in profiles:
+            totals = benchmark(pragmas, persistent, options)
+            errors = totals['write_errors'] + totals['read_errors']
+            self.stdout.write(
+                f'{name:<12}{totals["write"] / seconds:>12.0f}'
+                f'{totals["read"] / seconds:>12.0f}{errors:>9}'
+            )
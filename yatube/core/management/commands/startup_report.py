@@ -0,0 +1,100 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Выполняется в отдельном процессе, чтобы замерить холодный старт.
+CHILD = '''
+import json, sys, time
+started = time.perf_counter()
+from django.conf import settings
+config = json.loads(sys.argv[1])
+for name, value in config['settings'].items():
+    setattr(settings, name, value)
+settings.TEMPLATE_WARMUP = False
+from yatube.wsgi import application
+booted = time.perf_counter()
+compiled = 0
+if config['warmup']:
+    from core.warmup import warm_templates
+    compiled = warm_templates()
+warmed = time.perf_counter()
+from django.test import Client
+client = Client()
+requests = []
+for url in config['urls']:
+    timings = []
+    for _ in range(2):
+        begin = time.perf_counter()
+        status = client.get(url).status_code
+        timings.append((time.perf_counter() - begin) * 1000)
+    requests.append({'url': url, 'status': status, 'ms': timings})
+print(json.dumps({
+    'boot_ms': (booted - started) * 1000,
+    'warmup_ms': (warmed - booted) * 1000,
+    'templates': compiled,
+    'requests': requests,
+}))
+'''
+
+
+# Берутся из текущего процесса, чтобы замер не трогал файлы рабочего
+# дерева: под тестами это временный каталог метрик. Базу дочерний процесс
+# видит, только если она в файле: общая in-memory база SQLite, которую
+# создаёт тестовый прогон, другому процессу недоступна.
+INHERITED_SETTINGS = ('DATABASES', 'METRICS_DIR')
+
+
+def measure(settings_module, urls, warmup):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module)
+    config = {
+        'urls': urls,
+        'warmup': warmup,
+        'settings': {
+            name: getattr(settings, name) for name in INHERITED_SETTINGS
+        },
+    }
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD, json.dumps(config)],
+        cwd=settings.BASE_DIR, env=env,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    if result.returncode:
+        raise CommandError(result.stderr.strip())
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет в новом процессе старт WSGI-приложения и первые запросы '
+        'без прогрева шаблонов и с ним.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', action='append', dest='urls',
+            help='Адрес для замера (по умолчанию главная и «Об авторе»).',
+        )
+
+    def handle(self, *args, **options):
+        urls = options['urls'] or ['/', '/about/author/']
+        settings_module = os.environ['DJANGO_SETTINGS_MODULE']
+        self.stdout.write(f'Настройки: {settings_module}')
+        for warmup in (False, True):
+            report = measure(settings_module, urls, warmup)
+            title = 'с прогревом' if warmup else 'без прогрева'
+            self.stdout.write(
+                f'\n{title}: старт {report["boot_ms"]:.0f} мс, '
+                f'прогрев {report["warmup_ms"]:.0f} мс '
+                f'({report["templates"]} шаблонов)'
+            )
+            for request in report['requests']:
+                first, second = request['ms']
+                self.stdout.write(
+                    f'  {request["url"]} [{request["status"]}]: первый '
+                    f'{first:.1f} мс, повторный {second:.1f} мс'
+                )
@@ -0,0 +1,48 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def copy_database(source, target):
+    """Копирует SQLite-базу целиком через backup API.
+
+    Копия согласована, даже если в основную базу в это время пишут.
+    """
+    src, dst = sqlite3.connect(source), sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        src.close()
+        dst.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную SQLite-базу в реплики, имитируя репликацию '
+        'при локальной проверке маршрутизатора.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'aliases', nargs='*',
+            help='Алиасы реплик (по умолчанию DATABASE_REPLICAS).',
+        )
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or settings.DATABASE_REPLICAS
+        if not aliases:
+            raise CommandError('Реплики не заданы в DATABASE_REPLICAS.')
+        source = connections[DEFAULT_DB_ALIAS].settings_dict['NAME']
+        for alias in [DEFAULT_DB_ALIAS, *aliases]:
+            if alias not in connections.databases:
+                raise CommandError(f'Нет базы с алиасом {alias}.')
+            engine = connections[alias].settings_dict['ENGINE']
+            if not engine.endswith('sqlite3'):
+                raise CommandError(f'{alias}: поддерживается только SQLite.')
+        for alias in aliases:
+            connections[alias].close()
+            target = connections[alias].settings_dict['NAME']
+            copy_database(source, target)
+            self.stdout.write(f'{alias}: обновлена')
@@ -0,0 +1,254 @@
+"""Счётчики и гистограммы в текстовом формате Prometheus.
+
+Каждый процесс (WSGI-воркер, ``thumbnail_worker``) копит значения в
+памяти под своим замком и не чаще раза в ``METRICS_FLUSH_INTERVAL``
+секунд сбрасывает снимок в собственный файл в ``METRICS_DIR``. Между
+процессами замков нет: файл пишется во временный и подменяется
+``os.replace``. ``/metrics`` складывает снимки всех процессов, включая
+завершившиеся, поэтому счётчики не сбрасываются при перезапуске воркеров.
+Снимки завершившихся процессов при сборе переносятся в общий
+``retired.json`` и удаляются, чтобы каталог не рос с каждым перезапуском.
+
+uWSGI и ``gunicorn --preload`` импортируют приложение в мастере и
+форкают воркеры, поэтому после ``fork`` процесс заводит себе новый
+идентификатор снимка и пустые значения.
+"""
+import atexit
+import fcntl
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+QUERY_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+METRICS = {
+    'yatube_http_request_duration_seconds': (
+        'histogram', 'Время ответа по имени маршрута.', LATENCY_BUCKETS,
+    ),
+    'yatube_http_responses_total': (
+        'counter', 'Ответы по имени маршрута и коду статуса.', None,
+    ),
+    'yatube_db_queries_per_request': (
+        'histogram', 'Число SQL-запросов на один запрос.', QUERY_BUCKETS,
+    ),
+    'yatube_cache_requests_total': (
+        'counter', 'Чтения из кеша: result="hit" или "miss".', None,
+    ),
+    'yatube_thumbnail_generation_seconds': (
+        'histogram', 'Время генерации миниатюры.', LATENCY_BUCKETS,
+    ),
+}
+
+RETIRED_FILE = 'retired.json'
+LOCK_FILE = '.lock'
+
+_lock = threading.Lock()
+_values = {}
+_process_id = None
+_last_flush = time.monotonic()
+
+
+def _snapshot_name():
+    global _process_id
+    if _process_id is None:
+        _process_id = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+    return f'{_process_id}.json'
+
+
+def _forget_parent():
+    global _lock, _process_id, _last_flush
+    # Замок мог быть захвачен другим потоком родителя в момент fork.
+    _lock = threading.Lock()
+    _values.clear()
+    _process_id = None
+    _last_flush = time.monotonic()
+
+
+os.register_at_fork(after_in_child=_forget_parent)
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    with _lock:
+        key = _key(name, labels)
+        _values[key] = _values.get(key, 0) + amount
+    _maybe_flush()
+
+
+def observe(name, value, **labels):
+    buckets = METRICS[name][2]
+    with _lock:
+        key = _key(name, labels)
+        state = _values.get(key)
+        if state is None:
+            state = _values[key] = [[0] * (len(buckets) + 1), 0.0]
+        state[0][bisect_left(buckets, value)] += 1
+        state[1] += value
+    _maybe_flush()
+
+
+def _maybe_flush():
+    if time.monotonic() - _last_flush >= settings.METRICS_FLUSH_INTERVAL:
+        flush()
+
+
+def flush():
+    """Сохраняет снимок процесса в его файл."""
+    global _last_flush
+    with _lock:
+        _last_flush = time.monotonic()
+        if not _values:
+            return
+        snapshot = json.dumps([
+            [name, list(labels), value]
+            for (name, labels), value in _values.items()
+        ])
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    path = os.path.join(settings.METRICS_DIR, _snapshot_name())
+    tmp_path = f'{path}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w') as file:
+        file.write(snapshot)
+    os.replace(tmp_path, path)
+
+
+atexit.register(flush)
+
+
+def collect():
+    """Сумма снимков всех процессов: {(имя, метки): значение}."""
+    flush()
+    try:
+        lock = open(os.path.join(settings.METRICS_DIR, LOCK_FILE), 'a')
+    except FileNotFoundError:
+        return {}
+    with lock:
+        # Замок не даёт двум сборам перенести один снимок дважды.
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        _retire_dead()
+        totals = {}
+        for filename in _snapshot_files():
+            _merge(totals, _read(filename))
+    return totals
+
+
+def reset():
+    """Забывает значения процесса, не сбрасывая их в файл."""
+    with _lock:
+        _values.clear()
+
+
+def _snapshot_files():
+    return [
+        filename for filename in os.listdir(settings.METRICS_DIR)
+        if filename.endswith('.json')
+    ]
+
+
+def _read(filename):
+    try:
+        with open(os.path.join(settings.METRICS_DIR, filename)) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return []
+
+
+def _merge(totals, snapshot):
+    for name, labels, value in snapshot:
+        if name not in METRICS:
+            continue
+        key = (name, tuple(tuple(pair) for pair in labels))
+        if METRICS[name][0] == 'counter':
+            totals[key] = totals.get(key, 0) + value
+            continue
+        buckets, total = totals.setdefault(key, [[0] * len(value[0]), 0.0])
+        for index, count in enumerate(value[0]):
+            buckets[index] += count
+        totals[key][1] = total + value[1]
+
+
+def _is_alive(filename):
+    """Жив ли процесс, записавший снимок ``{pid}-{id}.json``."""
+    pid = filename.split('-', 1)[0]
+    if not pid.isdigit():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _retire_dead():
+    """Переносит снимки завершившихся процессов в ``RETIRED_FILE``."""
+    dead = [
+        filename for filename in _snapshot_files()
+        if filename != RETIRED_FILE and not _is_alive(filename)
+    ]
+    if not dead:
+        return
+    totals = {}
+    for filename in [RETIRED_FILE] + dead:
+        _merge(totals, _read(filename))
+    path = os.path.join(settings.METRICS_DIR, RETIRED_FILE)
+    with open(f'{path}.tmp', 'w') as file:
+        json.dump([
+            [name, list(labels), value]
+            for (name, labels), value in totals.items()
+        ], file)
+    os.replace(f'{path}.tmp', path)
+    for filename in dead:
+        os.remove(os.path.join(settings.METRICS_DIR, filename))
+
+
+def _format_labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = (
+        '{}="{}"'.format(
+            name,
+            str(value).replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n'),
+        )
+        for name, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def render():
+    """Текст для /metrics в формате Prometheus 0.0.4."""
+    totals = collect()
+    lines = []
+    for name, (kind, help_text, bounds) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        series = sorted(
+            (labels, value) for (metric, labels), value in totals.items()
+            if metric == name
+        )
+        for labels, value in series:
+            if kind == 'counter':
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+                continue
+            buckets, total = value
+            cumulative = 0
+            for bound, count in zip(bounds + ('+Inf',), buckets):
+                cumulative += count
+                bucket_labels = _format_labels(labels, le=bound)
+                lines.append(f'{name}_bucket{bucket_labels} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {total}')
+            lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
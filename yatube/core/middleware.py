@@ -0,0 +1,135 @@
+import cProfile
+import json
+import logging
+import os
+import random
+import re
+import time
+
+from django.conf import settings
+
+from . import instrumentation, metrics, routers
+
+logger = logging.getLogger('yatube.profiling')
+
+UNSAFE_PATH_CHARS = re.compile(r'[^\w.-]+')
+
+
+class ProfilingMiddleware:
+    """Замеры стоимости запроса для логов, профилей и ``/metrics``.
+
+    Замеряет SQL, рендеринг шаблонов, кеш и процессорное время потока.
+    Разбивка уходит клиенту в заголовке ``Server-Timing`` только при
+    ``PROFILING_SERVER_TIMING``: она раскрывает внутреннее устройство сайта.
+    Доля ``PROFILING_LOG_RATE`` запросов пишется в лог ``yatube.profiling``,
+    доля ``PROFILING_CPROFILE_RATE`` снимается под cProfile в
+    ``PROFILING_CPROFILE_DIR``. Итоги каждого запроса попадают в
+    ``core.metrics`` для ``/metrics``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profiler = None
+        if random.random() < settings.PROFILING_CPROFILE_RATE:
+            profiler = cProfile.Profile()
+        with instrumentation.collect() as measurement:
+            if profiler is None:
+                response = self.get_response(request)
+            else:
+                response = profiler.runcall(self.get_response, request)
+        if settings.PROFILING_SERVER_TIMING:
+            response['Server-Timing'] = server_timing(measurement)
+        if random.random() < settings.PROFILING_LOG_RATE:
+            logger.info(json.dumps(dict(
+                measurement.as_dict(),
+                method=request.method,
+                path=request.path,
+                status=response.status_code,
+            )))
+        if profiler is not None:
+            dump_profile(profiler, request)
+        record_metrics(request, response, measurement)
+        return response
+
+
+class ReplicaPinMiddleware:
+    """Закрепляет за основной базой чтения пользователя, который писал.
+
+    Открывает на время запроса область чтений с реплик. Запрос с cookie
+    ``REPLICA_PIN_COOKIE`` читает только из ``default``. Запрос, который
+    записал что-то в реплицируемое приложение, ставит эту cookie на
+    ``REPLICA_PIN_SECONDS``, чтобы следующие страницы показали изменения
+    раньше, чем до реплик дойдёт репликация.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pinned = settings.REPLICA_PIN_COOKIE in request.COOKIES
+        with routers.request_scope(pinned) as scope:
+            response = self.get_response(request)
+        if scope.written:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+
+def record_metrics(request, response, measurement):
+    match = request.resolver_match
+    view = match.view_name if match else 'unresolved'
+    metrics.observe(
+        'yatube_http_request_duration_seconds',
+        measurement.total_time, view=view,
+    )
+    metrics.inc(
+        'yatube_http_responses_total',
+        view=view, status=response.status_code,
+    )
+    metrics.observe(
+        'yatube_db_queries_per_request', measurement.queries, view=view
+    )
+    if measurement.cache_hits:
+        metrics.inc(
+            'yatube_cache_requests_total', measurement.cache_hits,
+            view=view, result='hit',
+        )
+    if measurement.cache_misses:
+        metrics.inc(
+            'yatube_cache_requests_total', measurement.cache_misses,
+            view=view, result='miss',
+        )
+
+
+def server_timing(measurement):
+    cache_desc = (
+        f'{measurement.cache_hits} hits / {measurement.cache_misses} misses'
+    )
+    metrics = [
+        ('sql', measurement.sql_time, f'{measurement.queries} queries'),
+        ('render', measurement.render_time, None),
+        ('cache', measurement.cache_time, cache_desc),
+        ('cpu', measurement.cpu_time, None),
+        ('total', measurement.total_time, None),
+    ]
+    parts = []
+    for name, seconds, desc in metrics:
+        part = f'{name};dur={seconds * 1000:.2f}'
+        if desc:
+            part += f';desc="{desc}"'
+        parts.append(part)
+    return ', '.join(parts)
+
+
+def dump_profile(profiler, request):
+    os.makedirs(settings.PROFILING_CPROFILE_DIR, exist_ok=True)
+    path = UNSAFE_PATH_CHARS.sub('_', request.path).strip('_') or 'root'
+    filename = f'{time.time():.6f}-{request.method}-{path}.prof'
+    profiler.dump_stats(
+        os.path.join(settings.PROFILING_CPROFILE_DIR, filename)
+    )
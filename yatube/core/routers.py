@@ -0,0 +1,89 @@
+"""Чтение с реплик, запись в основную базу.
+
+Модели приложений из ``DATABASE_REPLICATED_APPS`` читаются со случайной
+реплики из ``DATABASE_REPLICAS``, но только внутри ``request_scope()`` —
+его открывает ``ReplicaPinMiddleware`` на время запроса. Фоновые задачи и
+команды читают из ``default`` и не видят отставания реплик. Любые записи
+идут в ``default``. Пустой список реплик отключает маршрутизацию.
+
+Чтобы пользователь видел собственные изменения, запись в реплицируемое
+приложение закрепляет остаток области за основной базой, а
+``ReplicaPinMiddleware`` продлевает закрепление cookie на
+``REPLICA_PIN_SECONDS``, пока реплики догоняют основную базу.
+
+Кэш, который пересобирается по поколению, заполняется внутри
+``primary()``: иначе отставшая реплика попала бы в кэш под новым
+поколением и жила бы там до следующего сброса.
+"""
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_state = threading.local()
+
+
+class Scope:
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.written = False
+
+
+@contextmanager
+def request_scope(pinned=False):
+    """Область, в которой чтения могут идти на реплики."""
+    outer = getattr(_state, 'scope', None)
+    _state.scope = scope = Scope(pinned)
+    try:
+        yield scope
+    finally:
+        _state.scope = outer
+
+
+@contextmanager
+def primary():
+    """Все чтения блока идут в основную базу."""
+    _state.primary = getattr(_state, 'primary', 0) + 1
+    try:
+        yield
+    finally:
+        _state.primary -= 1
+
+
+def current_scope():
+    return getattr(_state, 'scope', None)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        scope = current_scope()
+        if not replicas or scope is None or scope.pinned:
+            return DEFAULT_DB_ALIAS
+        if getattr(_state, 'primary', 0):
+            return DEFAULT_DB_ALIAS
+        if model._meta.app_label not in settings.DATABASE_REPLICATED_APPS:
+            return DEFAULT_DB_ALIAS
+        # Внутри транзакции читаем то, что она уже записала.
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        scope = current_scope()
+        # Сессии и пользователи читаются из default и закрепления не требуют.
+        replicated = (
+            model._meta.app_label in settings.DATABASE_REPLICATED_APPS
+        )
+        if scope is not None and replicated:
+            scope.pinned = scope.written = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы, связи между ними допустимы.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == DEFAULT_DB_ALIAS
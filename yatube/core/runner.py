@@ -0,0 +1,26 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+from . import metrics
+
+
+class TestRunner(DiscoverRunner):
+    """Запуск тестов с метриками во временном каталоге.
+
+    Иначе снимки тестового процесса, включая сброс при выходе, попали бы
+    в ``METRICS_DIR`` рабочего дерева.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._metrics_dir = settings.METRICS_DIR
+        settings.METRICS_DIR = tempfile.mkdtemp(prefix='yatube-metrics-')
+
+    def teardown_test_environment(self, **kwargs):
+        metrics.reset()
+        shutil.rmtree(settings.METRICS_DIR, ignore_errors=True)
+        settings.METRICS_DIR = self._metrics_dir
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,21 @@
+"""Настройка соединений SQLite прагмами из ``SQLITE_PRAGMAS``.
+
+Прагмы выполняются на «сыром» соединении ``sqlite3`` сразу после его
+открытия. Они не проходят через курсоры Django, поэтому не попадают в
+счётчики запросов, а с ``CONN_MAX_AGE`` выполняются один раз на
+соединение, а не на каждый запрос.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+def apply_pragmas(raw_connection, pragmas):
+    for name, value in pragmas.items():
+        raw_connection.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite' and settings.SQLITE_PRAGMAS:
+        apply_pragmas(connection.connection, settings.SQLITE_PRAGMAS)
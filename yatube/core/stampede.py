@@ -0,0 +1,84 @@
+"""Кэш без «стампеды»: один процесс пересчитывает, остальные ждут не базу.
+
+Когда популярная запись кэша истекает, её одновременно пересчитывают все
+воркеры. ``get_or_compute`` борется с этим двумя способами:
+
+* вероятностное раннее обновление (XFetch): чем ближе срок и чем дольше
+  пересчёт, тем вероятнее, что запрос обновит запись заранее, пока она
+  ещё свежая у остальных;
+* single-flight: пересчитывает только взявший блокировку через
+  ``cache.add``, остальные отдают устаревшее значение, а если его нет —
+  недолго ждут результата победителя.
+
+Запись хранится дольше своего срока, чтобы было что отдать, пока идёт
+пересчёт. ``version`` (например, поколение лент) делает запись
+устаревшей сразу, но она всё равно годится как запасная — кроме
+``stale=False``, когда значение другой версии не отдаётся. Пересчёт читает
+из основной базы, чтобы под новой версией не закэшировать отставшую
+реплику.
+"""
+import math
+import random
+import time
+
+from django.core.cache import cache as default_cache
+
+from . import routers
+
+# Во сколько раз запись живёт в кэше дольше своего срока свежести.
+STALE_FACTOR = 2
+LOCK_TIMEOUT = 10
+WAIT_TIMEOUT = 2
+WAIT_INTERVAL = 0.02
+
+
+def is_fresh(entry, version, beta=1.0, now=None):
+    """Свежа ли запись с учётом раннего обновления XFetch."""
+    _, entry_version, delta, expires = entry
+    if entry_version != version:
+        return False
+    now = time.time() if now is None else now
+    # -log(u) для u из (0, 1] — экспонента со средним 1.
+    early = delta * beta * -math.log(1 - random.random())
+    return now + early < expires
+
+
+def get_or_compute(key, compute, timeout, version=None, beta=1.0,
+                   cache=default_cache, stale=True):
+    """Значение из кэша или ``compute()``, пересчитываемое одним процессом.
+
+    В кэше лежит кортеж ``(value, version, delta, expires)``: ``delta`` —
+    сколько секунд занял последний пересчёт. С ``stale=False`` значение
+    прежней версии не отдаётся: запрос ждёт пересчёта, как при промахе.
+    """
+    entry = cache.get(key)
+    if entry is not None and is_fresh(entry, version, beta):
+        return entry[0]
+    lock = f'{key}:lock'
+    if cache.add(lock, 1, LOCK_TIMEOUT):
+        try:
+            return _recompute(key, compute, timeout, version, cache)
+        finally:
+            cache.delete(lock)
+    if entry is not None and (stale or entry[1] == version):
+        return entry[0]
+    # Отдать нечего: ждём победителя, а не идём в базу вслед за ним.
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None and entry[1] == version:
+            return entry[0]
+    return _recompute(key, compute, timeout, version, cache)
+
+
+def _recompute(key, compute, timeout, version, cache):
+    started = time.perf_counter()
+    with routers.primary():
+        value = compute()
+    delta = time.perf_counter() - started
+    cache.set(
+        key, (value, version, delta, time.time() + timeout),
+        timeout * STALE_FACTOR,
+    )
+    return value
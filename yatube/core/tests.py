@@ -0,0 +1,655 @@
+import copy
+import json
+import os
+import re
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.template import Context, Template, engines
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+
+from . import (auth, instrumentation, metrics, routers, sqlite, stampede,
+               warmup)
+from .cache import SQLiteCache
+from .management.commands.sync_replicas import copy_database
+
+User = get_user_model()
+
+TEMP_PROFILES_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def timing(response):
+    """Разбирает Server-Timing в словарь {метрика: (dur, desc)}."""
+    metrics = {}
+    for part in response['Server-Timing'].split(', '):
+        name, *params = part.split(';')
+        params = dict(param.split('=', 1) for param in params)
+        metrics[name] = (float(params['dur']), params.get('desc', ''))
+    return metrics
+
+
+@override_settings(PROFILING_SERVER_TIMING=True)
+class ProfilingMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='author')
+        Post.objects.create(author=author, text='Тестовый пост')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_PROFILES_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_server_timing_breakdown(self):
+        '''Server-Timing содержит SQL, шаблоны, кеш, CPU и общее время.'''
+        response = self.guest_client.get('/')
+        metrics = timing(response)
+        self.assertEqual(
+            set(metrics), {'sql', 'render', 'cache', 'cpu', 'total'}
+        )
+        self.assertRegex(metrics['sql'][1], r'"[1-9]\d* queries"')
+        self.assertGreater(metrics['render'][0], 0)
+
+    @override_settings(PROFILING_SERVER_TIMING=False)
+    def test_server_timing_is_opt_in(self):
+        '''Без PROFILING_SERVER_TIMING разбивка клиенту не отдаётся.'''
+        response = self.guest_client.get('/')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_cache_hits_are_counted(self):
+        '''Повторный запрос ленты читает фрагменты из кеша.'''
+        self.guest_client.get('/')
+        response = self.guest_client.get('/')
+        hits = re.search(r'(\d+) hits', timing(response)['cache'][1])
+        self.assertGreater(int(hits.group(1)), 0)
+
+    def test_nested_measurements_see_everything(self):
+        '''Внешний замер видит рендеринг внутри middleware.'''
+        with instrumentation.collect() as measurement:
+            response = self.guest_client.get('/')
+        self.assertGreater(measurement.render_time, 0)
+        self.assertGreaterEqual(
+            measurement.queries,
+            int(re.search(r'\d+', timing(response)['sql'][1]).group()),
+        )
+
+    @override_settings(PROFILING_LOG_RATE=1.0)
+    def test_sampled_requests_are_logged(self):
+        '''Выбранные запросы пишутся в лог одной JSON-строкой.'''
+        with self.assertLogs('yatube.profiling', level='INFO') as logs:
+            self.guest_client.get('/about/tech/')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], '/about/tech/')
+        self.assertEqual(record['status'], 200)
+        self.assertIn('sql_ms', record)
+
+    @override_settings(
+        PROFILING_CPROFILE_RATE=1.0, PROFILING_CPROFILE_DIR=TEMP_PROFILES_DIR
+    )
+    def test_cprofile_dump(self):
+        '''Выбранный запрос сохраняет профиль cProfile.'''
+        self.guest_client.get('/about/tech/')
+        dumps = os.listdir(TEMP_PROFILES_DIR)
+        self.assertEqual(len(dumps), 1)
+        self.assertTrue(dumps[0].endswith('-GET-about_tech.prof'))
+
+
+TEMP_METRICS_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(METRICS_DIR=TEMP_METRICS_DIR)
+class MetricsTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_METRICS_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def sample(self, text, series):
+        """Значение ряда ``series`` в выводе /metrics или 0."""
+        for line in text.splitlines():
+            if line.startswith(series + ' '):
+                return float(line.rsplit(' ', 1)[1])
+        return 0
+
+    def test_requests_are_counted_by_view(self):
+        '''Ответы считаются по имени маршрута и коду статуса.'''
+        series = (
+            'yatube_http_responses_total{status="200",view="posts:main"}'
+        )
+        before = self.sample(
+            self.guest_client.get('/metrics').content.decode(), series
+        )
+        self.guest_client.get('/')
+        response = self.guest_client.get('/metrics')
+        text = response.content.decode()
+        self.assertEqual(self.sample(text, series), before + 1)
+        self.assertIn('# TYPE yatube_http_request_duration_seconds '
+                      'histogram', text)
+        self.assertIn('yatube_http_request_duration_seconds_bucket'
+                      '{view="posts:main",le="+Inf"}', text)
+        self.assertIn('yatube_db_queries_per_request_count'
+                      '{view="posts:main"}', text)
+
+    def test_cache_reads_are_counted(self):
+        '''Попадания в кеш считаются без PROFILING_SERVER_TIMING.'''
+        series = (
+            'yatube_cache_requests_total{result="hit",view="posts:main"}'
+        )
+        self.assertFalse(settings.PROFILING_SERVER_TIMING)
+        before = self.sample(metrics.render(), series)
+        self.guest_client.get('/')
+        self.guest_client.get('/')
+        self.assertGreater(self.sample(metrics.render(), series), before)
+
+    def test_snapshots_of_all_processes_are_summed(self):
+        '''Снимки других процессов складываются с текущим.'''
+        series = 'yatube_http_responses_total{status="200",view="about:tech"}'
+        self.guest_client.get('/about/tech/')
+        before = self.sample(metrics.render(), series)
+        with open(os.path.join(TEMP_METRICS_DIR, 'other.json'), 'w') as file:
+            json.dump([[
+                'yatube_http_responses_total',
+                [['status', 200], ['view', 'about:tech']],
+                5,
+            ]], file)
+        self.assertEqual(self.sample(metrics.render(), series), before + 5)
+
+    def test_dead_process_snapshots_are_retired(self):
+        '''Снимки завершившихся процессов сливаются в один файл.'''
+        series = 'yatube_http_responses_total{status="404",view="gone"}'
+        process = subprocess.Popen([sys.executable, '-c', ''])
+        process.wait()
+        for name in (f'{process.pid}-dead.json', 'retired.json'):
+            with open(os.path.join(TEMP_METRICS_DIR, name), 'w') as file:
+                json.dump([[
+                    'yatube_http_responses_total',
+                    [['status', 404], ['view', 'gone']],
+                    2,
+                ]], file)
+        self.assertEqual(self.sample(metrics.render(), series), 4)
+        self.assertFalse(os.path.exists(
+            os.path.join(TEMP_METRICS_DIR, f'{process.pid}-dead.json')
+        ))
+        self.assertEqual(self.sample(metrics.render(), series), 4)
+
+    def test_forked_worker_writes_own_snapshot(self):
+        '''Воркер, форкнутый из мастера, не перезаписывает снимок мастера.'''
+        series = 'yatube_http_responses_total{status="200",view="forked"}'
+        metrics.inc('yatube_http_responses_total', status=200, view='forked')
+        metrics.flush()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                metrics.inc(
+                    'yatube_http_responses_total', status=200, view='forked'
+                )
+                metrics.flush()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        self.assertEqual(self.sample(metrics.render(), series), 2)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.1'])
+    def test_metrics_are_closed_to_other_addresses(self):
+        '''/metrics не отдаётся адресам вне METRICS_ALLOWED_IPS.'''
+        self.assertEqual(self.guest_client.get('/metrics').status_code, 403)
+        response = self.guest_client.get('/metrics', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTest(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        Post.objects.create(author=self.author, text='Тестовый пост')
+        self.client.force_login(self.author)
+
+    def replica_queries(self, url):
+        with CaptureQueriesContext(connections['replica']) as queries:
+            self.client.get(url)
+        return len(queries)
+
+    def test_reads_go_to_replica(self):
+        '''Чтения постов без недавней записи идут на реплику.'''
+        self.assertGreater(self.replica_queries(reverse(
+            'posts:profile', kwargs={'username': 'author'}
+        )), 0)
+        self.assertEqual(
+            routers.PrimaryReplicaRouter().db_for_read(User),
+            DEFAULT_DB_ALIAS,
+        )
+
+    def test_reads_after_write_stick_to_primary(self):
+        '''После записи пользователь читает из основной базы.'''
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': 'Новый пост'}
+        )
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+        self.assertEqual(self.replica_queries(reverse('posts:main')), 0)
+
+    def test_write_pins_rest_of_request(self):
+        '''Запись направляет следующие чтения области в default.'''
+        router = routers.PrimaryReplicaRouter()
+        with routers.request_scope():
+            self.assertEqual(router.db_for_read(Post), 'replica')
+            self.assertEqual(router.db_for_write(Post), DEFAULT_DB_ALIAS)
+            self.assertEqual(router.db_for_read(Post), DEFAULT_DB_ALIAS)
+        with routers.request_scope():
+            self.assertEqual(router.db_for_read(Post), 'replica')
+
+    def test_reads_outside_request_use_primary(self):
+        '''Вне запроса запись не закрепляет поток, а чтения идут в default.'''
+        router = routers.PrimaryReplicaRouter()
+        router.db_for_write(Post)
+        self.assertEqual(router.db_for_read(Post), DEFAULT_DB_ALIAS)
+        self.assertIsNone(routers.current_scope())
+
+    def test_session_write_does_not_pin(self):
+        '''Вход с записью сессии не ставит cookie закрепления.'''
+        self.author.set_password('password')
+        self.author.save()
+        response = Client().post(
+            reverse('login'),
+            {'username': 'author', 'password': 'password'},
+        )
+        self.assertIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+        with routers.request_scope() as scope:
+            routers.PrimaryReplicaRouter().db_for_write(User)
+        self.assertFalse(scope.written)
+
+    def test_cache_rebuild_reads_primary(self):
+        '''Фрагменты и ленты под новым поколением собираются из default.'''
+        for url in (reverse('posts:main'), reverse('posts:atom_index')):
+            with self.subTest(url=url):
+                cache.clear()
+                self.assertEqual(self.replica_queries(url), 0)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        '''Без реплик всё читается из default.'''
+        self.assertEqual(self.replica_queries(reverse('posts:main')), 0)
+
+    def test_copy_database(self):
+        '''sync_replicas переносит содержимое файла базы.'''
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        source = os.path.join(directory, 'primary.sqlite3')
+        target = os.path.join(directory, 'replica.sqlite3')
+        db = sqlite3.connect(source)
+        db.execute('CREATE TABLE post (text TEXT)')
+        db.execute("INSERT INTO post VALUES ('пост')")
+        db.commit()
+        db.close()
+        copy_database(source, target)
+        db = sqlite3.connect(target)
+        self.assertEqual(
+            db.execute('SELECT text FROM post').fetchall(), [('пост',)]
+        )
+        db.close()
+
+
+class SqlitePragmasTest(TestCase):
+    def setUp(self):
+        raw = connections[DEFAULT_DB_ALIAS].connection
+        cache_size = raw.execute('PRAGMA cache_size').fetchone()[0]
+        # Соединение общее для всех тестов: возвращаем прежний размер.
+        self.addCleanup(raw.execute, f'PRAGMA cache_size = {cache_size}')
+
+    def test_pragmas_applied_to_new_connections(self):
+        '''Новое соединение получает прагмы из SQLITE_PRAGMAS.'''
+        raw = connections[DEFAULT_DB_ALIAS].connection
+        with override_settings(SQLITE_PRAGMAS={'cache_size': -1234}):
+            sqlite.configure_connection(
+                sender=None, connection=connections[DEFAULT_DB_ALIAS]
+            )
+        self.assertEqual(raw.execute('PRAGMA cache_size').fetchone(),
+                         (-1234,))
+
+    def test_wal_mode_on_file_database(self):
+        '''Файловая база переходит в WAL.'''
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        db = sqlite3.connect(os.path.join(directory, 'db.sqlite3'))
+        sqlite.apply_pragmas(db, {'journal_mode': 'WAL'})
+        self.assertEqual(db.execute('PRAGMA journal_mode').fetchone(),
+                         ('wal',))
+        db.close()
+
+    @override_settings(SQLITE_PRAGMAS={'journal_mode': 'WAL'})
+    def test_benchmark_reports_both_profiles(self):
+        '''benchmark_sqlite печатает строку на каждый профиль.'''
+        out = StringIO()
+        call_command('benchmark_sqlite', seconds=0.1, rows=10,
+                     writers=1, readers=1, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split()[0] for line in lines[1:]],
+                         ['default', 'production'])
+
+
+CACHED_TEMPLATES = [dict(
+    settings.TEMPLATES[0],
+    APP_DIRS=False,
+    OPTIONS=dict(settings.TEMPLATES[0]['OPTIONS'], loaders=[
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]),
+)]
+
+
+class WarmupTest(TestCase):
+    @override_settings(TEMPLATES=CACHED_TEMPLATES)
+    def test_all_project_templates_are_cached(self):
+        '''Прогрев кладёт в кэш загрузчика все шаблоны из templates/.'''
+        names = set(warmup.template_names(settings.TEMPLATES_DIR))
+        self.assertIn('posts/index.html', names)
+        with self.assertLogs('yatube.warmup', 'INFO'):
+            self.assertEqual(warmup.warm_templates(), len(names))
+        loader = engines['django'].engine.template_loaders[0]
+        self.assertTrue(names <= set(loader.get_template_cache))
+
+    def test_startup_report(self):
+        '''startup_report замеряет старт и запросы в новом процессе.'''
+        # Тестовая база живёт в памяти этого процесса: дочернему нужна копия.
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        databases = copy.deepcopy(settings.DATABASES)
+        databases[DEFAULT_DB_ALIAS]['NAME'] = os.path.join(
+            directory, 'db.sqlite3'
+        )
+        target = sqlite3.connect(databases[DEFAULT_DB_ALIAS]['NAME'])
+        connections[DEFAULT_DB_ALIAS].connection.backup(target)
+        target.close()
+        out = StringIO()
+        # Соединения этого процесса не меняются, настройка нужна только
+        # дочернему.
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)
+            with override_settings(DATABASES=databases):
+                call_command(
+                    'startup_report', urls=['/', '/about/author/'],
+                    stdout=out,
+                )
+        report = out.getvalue()
+        self.assertIn('с прогревом', report)
+        self.assertIn('/ [200]', report)
+        self.assertIn('/about/author/ [200]', report)
+
+
+class SQLiteCacheTest(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.location = os.path.join(directory, 'cache.sqlite3')
+        self.cache = self.open()
+
+    def open(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_basic_operations(self):
+        '''Кэш поддерживает операции, которыми пользуется приложение.'''
+        self.cache.set('post', {'text': 'Пост'})
+        self.assertEqual(self.cache.get('post'), {'text': 'Пост'})
+        self.assertFalse(self.cache.add('post', 'другое'))
+        self.assertTrue(self.cache.add('generation', 1, None))
+        self.assertEqual(self.cache.incr('generation', 5), 6)
+        self.assertEqual(
+            self.cache.get_many(['post', 'generation', 'missing']),
+            {'post': {'text': 'Пост'}, 'generation': 6},
+        )
+        self.cache.delete('post')
+        self.assertIsNone(self.cache.get('post'))
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_expired_entries_are_missing(self):
+        '''Просроченная запись не читается и уступает место add().'''
+        self.cache.set('fragment', 'старое', 0.05)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('fragment'))
+        self.assertTrue(self.cache.add('fragment', 'новое'))
+
+    def test_shared_between_instances(self):
+        '''Запись одного воркера видна другому, открывшему тот же файл.'''
+        self.cache.set('fragment', 'общий')
+        self.assertEqual(self.open().get('fragment'), 'общий')
+
+    def test_incr_is_atomic(self):
+        '''Одновременные incr из разных соединений не теряются.'''
+        self.cache.set('counter', 0)
+
+        def bump():
+            cache = self.open()
+            for _ in range(50):
+                cache.incr('counter')
+
+        threads = [threading.Thread(target=bump) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+
+    def test_cull_keeps_permanent_keys(self):
+        '''При переполнении бессрочные ключи вытесняются последними.'''
+        cache = self.open(MAX_ENTRIES=10, CULL_FREQUENCY=2)
+        cache.set('generation', 1, None)
+        for i in range(20):
+            cache.set(f'fragment:{i}', i)
+        self.assertEqual(cache.get('generation'), 1)
+        self.assertLessEqual(
+            len(cache.get_many([f'fragment:{i}' for i in range(20)])), 10
+        )
+
+    def test_benchmark(self):
+        '''benchmark_cache сравнивает LocMemCache и общий кэш.'''
+        out = StringIO()
+        call_command('benchmark_cache', workers=2, keys=10, operations=50,
+                     render_ms=0, stdout=out)
+        rows = [line.split()[0] for line in out.getvalue().splitlines()]
+        self.assertEqual(rows[1:], ['locmem', 'sqlite'])
+
+
+class StampedeTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self, value='новое'):
+        self.calls += 1
+        return value
+
+    def test_fresh_value_is_not_recomputed(self):
+        '''Свежая запись отдаётся без пересчёта.'''
+        stampede.get_or_compute('key', self.compute, 60)
+        self.assertEqual(stampede.get_or_compute('key', self.compute, 60),
+                         'новое')
+        self.assertEqual(self.calls, 1)
+
+    def test_new_version_recomputes(self):
+        '''Смена версии делает запись устаревшей.'''
+        stampede.get_or_compute('key', self.compute, 60, version=1)
+        stampede.get_or_compute('key', self.compute, 60, version=2)
+        self.assertEqual(self.calls, 2)
+
+    def test_stale_value_served_while_locked(self):
+        '''Пока пересчитывает другой, отдаётся прежнее значение.'''
+        stampede.get_or_compute('key', lambda: 'старое', 60, version=1)
+        cache.add('key:lock', 1)
+        value = stampede.get_or_compute('key', self.compute, 60, version=2)
+        self.assertEqual(value, 'старое')
+        self.assertEqual(self.calls, 0)
+
+    @mock.patch('core.stampede.WAIT_TIMEOUT', 0.05)
+    def test_stale_value_refused(self):
+        '''С stale=False значение прежней версии не отдаётся.'''
+        stampede.get_or_compute('key', lambda: 'старое', 60, version=1)
+        cache.add('key:lock', 1)
+        value = stampede.get_or_compute(
+            'key', self.compute, 60, version=2, stale=False
+        )
+        self.assertEqual(value, 'новое')
+        self.assertEqual(self.calls, 1)
+
+    def test_early_expiration(self):
+        '''XFetch обновляет запись до срока, если пересчёт дорог.'''
+        entry = ('значение', None, 1.0, 100.0)
+        with mock.patch('core.stampede.random.random', return_value=0.99):
+            self.assertFalse(stampede.is_fresh(entry, None, now=98.0))
+        with mock.patch('core.stampede.random.random', return_value=0.0):
+            self.assertTrue(stampede.is_fresh(entry, None, now=98.0))
+
+    def test_concurrent_misses_compute_once(self):
+        '''Одновременные промахи пересчитывают значение один раз.'''
+        results = []
+
+        def slow():
+            time.sleep(0.1)
+            return self.compute()
+
+        def request():
+            results.append(stampede.get_or_compute('key', slow, 60))
+
+        threads = [threading.Thread(target=request) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, ['новое'] * 8)
+
+    def test_template_tag(self):
+        '''fragment_cache кэширует фрагмент до смены версии.'''
+        template = Template(
+            '{% load fragment_cache %}'
+            '{% fragment_cache 60 part page version=generation %}'
+            '{{ text }}{% endfragment_cache %}'
+        )
+
+        def render(text, generation):
+            return template.render(Context(
+                {'text': text, 'page': 1, 'generation': generation}
+            ))
+
+        self.assertEqual(render('первый', 1), 'первый')
+        self.assertEqual(render('второй', 1), 'первый')
+        self.assertEqual(render('второй', 2), 'второй')
+
+
+class CachedIdentityTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='author')
+        self.client.force_login(self.user)
+        self.url = reverse('about:author')
+
+    def test_authenticated_request_without_identity_queries(self):
+        '''Сессия и пользователь берутся из кэша, а не из базы.'''
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.context['user'], self.user)
+
+    def test_user_save_invalidates_cache(self):
+        '''Сохранение пользователя сбрасывает его копию в кэше.'''
+        self.client.get(self.url)
+        self.user.first_name = 'Лев'
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['user'].first_name, 'Лев')
+
+    def test_deactivated_user_is_logged_out(self):
+        '''Отключённый пользователь теряет вход сразу.'''
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertFalse(response.context['user'].is_authenticated)
+
+    def test_password_hash_is_not_cached(self):
+        '''В кэш не попадает хеш пароля, а сохранение его не теряет.'''
+        self.user.set_password('секретный-пароль')
+        self.user.save()
+        self.client.force_login(self.user)
+        self.client.get(self.url)
+        cached = cache.get(auth.USER_KEY.format(self.user.pk))
+        self.assertNotIn(self.user.password, repr(cached))
+
+        user = self.client.get(self.url).context['user']
+        self.assertEqual(user, self.user)
+        user.first_name = 'Лев'
+        user.save()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'Лев')
+        self.assertTrue(self.user.check_password('секретный-пароль'))
+
+    def test_sessions_of_plain_model_backend_stay_logged_in(self):
+        '''Сессии, созданные до кэширующего бэкенда, не разлогиниваются.'''
+        client = Client()
+        client.force_login(
+            self.user, backend='django.contrib.auth.backends.ModelBackend'
+        )
+        response = client.get(self.url)
+        self.assertEqual(response.context['user'], self.user)
+
+    def test_follow_looks_up_author_once(self):
+        '''Подписка не перечитывает пользователей из базы.'''
+        url = reverse('posts:profile_follow', kwargs={'username': 'author'})
+        self.client.get(self.url)
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as queries:
+            self.client.get(url)
+        # Полные строки пользователя; пересчёт счётчиков не в счёт.
+        user_queries = [
+            query for query in queries
+            if '"auth_user"."password"' in query['sql']
+        ]
+        self.assertEqual(len(user_queries), 1)
+        self.assertTrue(
+            self.user.follower.filter(author=self.author).exists()
+        )
+
+
+class CachedIdentityCommitTest(TransactionTestCase):
+    def test_cached_user_forgotten_after_commit(self):
+        '''Копия, закэшированная до коммита, сбрасывается после него.'''
+        user = User.objects.create_user(username='reader')
+        key = auth.USER_KEY.format(user.pk)
+        with transaction.atomic():
+            user.first_name = 'Лев'
+            user.save()
+            # Конкурентный запрос ещё видит прежнюю строку и кэширует её.
+            cache.set(key, auth.dump_user(User.objects.get(pk=user.pk)))
+        self.assertIsNone(cache.get(key))
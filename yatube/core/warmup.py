@@ -0,0 +1,44 @@
+"""Прогрев кэша шаблонов при старте воркера.
+
+С кэширующим загрузчиком шаблон разбирается один раз за жизнь процесса,
+но этот раз приходится на первый запрос, который его показывает.
+``warm_templates()`` заранее компилирует всё из каталогов ``DIRS``, и
+первые запросы воркера обходятся без разбора шаблонов.
+"""
+import logging
+import os
+import time
+
+from django.template import TemplateSyntaxError, engines
+
+logger = logging.getLogger('yatube.warmup')
+
+
+def template_names(directory):
+    for root, _, files in os.walk(directory):
+        for filename in files:
+            path = os.path.relpath(os.path.join(root, filename), directory)
+            yield path.replace(os.sep, '/')
+
+
+def warm_templates():
+    """Компилирует шаблоны всех Django-движков; возвращает их число."""
+    started = time.perf_counter()
+    compiled = 0
+    for backend in engines.all():
+        engine = getattr(backend, 'engine', None)
+        if engine is None:
+            continue
+        for directory in engine.dirs:
+            for name in template_names(directory):
+                try:
+                    engine.get_template(name)
+                except TemplateSyntaxError:
+                    logger.exception('Шаблон %s не компилируется', name)
+                    continue
+                compiled += 1
+    logger.info(
+        'Прогрето шаблонов: %d за %.0f мс',
+        compiled, (time.perf_counter() - started) * 1000,
+    )
+    return compiled
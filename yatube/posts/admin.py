@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Group, Post, Comment, Follow
+from .search import search_posts
 # Register your models here.
 
 
@@ -10,6 +11,14 @@ class PostAdmin(admin.ModelAdmin):
     list_editable = ('group',)
     empty_value_display = '-пусто-'
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).for_feed()
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search_posts(queryset, search_term, ranked=False), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('pk', 'title', 'slug', 'description')
@@ -0,0 +1,207 @@
+"""JSON-версии лент и страницы поста для мобильного клиента.
+
+Все списки листаются курсором ``(pub_date, id)``, параметр ``fields=``
+ограничивает поля поста, а значит и колонки в запросе. Ответы лент, общих
+для всех пользователей, кэшируются целиком по полному URL и поколению
+лент и отдают ETag, так что повторный запрос стоит одного чтения кэша
+или ответа 304.
+"""
+import hashlib
+import json
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.http import condition
+
+from core import routers
+
+from . import conditions, counters, feed_cache, timeline
+from .models import Group, Post, User
+from .paginators import CursorPaginator
+from .views import comments_page
+
+POST_FIELDS = ('id', 'text', 'pub_date', 'author', 'group', 'image', 'url')
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+
+class BadRequest(Exception):
+    pass
+
+
+def parse_fields(request):
+    raw = request.GET.get('fields')
+    if not raw:
+        return POST_FIELDS
+    fields = tuple(name.strip() for name in raw.split(',') if name.strip())
+    unknown = set(fields) - set(POST_FIELDS)
+    if unknown:
+        raise BadRequest(f'Неизвестные поля: {", ".join(sorted(unknown))}')
+    return fields
+
+
+def parse_limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise BadRequest('limit должен быть числом')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def select_fields(queryset, fields):
+    """Загружает только колонки и связи, нужные выбранным полям."""
+    columns = ['id', 'pub_date']
+    if 'text' in fields:
+        columns.append('text')
+    if 'image' in fields:
+        columns.append('image')
+    if 'author' in fields:
+        queryset = queryset.select_related('author')
+        columns.append('author__username')
+    if 'group' in fields:
+        queryset = queryset.select_related('group')
+        columns.append('group__slug')
+    return queryset.only(*columns)
+
+
+def serialize_post(post, fields):
+    data = {}
+    for name in fields:
+        if name == 'author':
+            data[name] = post.author.username
+        elif name == 'group':
+            data[name] = post.group.slug if post.group_id else None
+        elif name == 'image':
+            data[name] = post.image.url if post.image else None
+        elif name == 'url':
+            data[name] = reverse(
+                'posts:post_detail', kwargs={'post_id': post.id}
+            )
+        else:
+            data[name] = getattr(post, name)
+    return data
+
+
+def page_link(request, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = cursor
+    return f'{request.path}?{params.urlencode()}'
+
+
+def post_list(request, queryset):
+    fields = parse_fields(request)
+    paginator = CursorPaginator(
+        select_fields(queryset, fields), parse_limit(request)
+    )
+    page = paginator.get_page(request.GET.get('cursor'))
+    return {
+        'results': [serialize_post(post, fields) for post in page],
+        'next': page_link(request, page.next_cursor),
+        'previous': page_link(request, page.previous_cursor),
+    }
+
+
+def json_response(build, cache_key=None):
+    """Собирает JSON; с ключом берёт готовое тело из кэша."""
+    body = cache.get(cache_key) if cache_key else None
+    if body is None:
+        try:
+            # Тело под ключом поколения собирается из основной базы.
+            with routers.primary() if cache_key else nullcontext():
+                body = json.dumps(build(), cls=DjangoJSONEncoder)
+        except BadRequest as error:
+            return JsonResponse({'detail': str(error)}, status=400)
+        if cache_key:
+            cache.set(cache_key, body, settings.API_CACHE_TIMEOUT)
+    return HttpResponse(body, content_type='application/json')
+
+
+def feed_cache_key(request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'posts:api:{feed_cache.get_generation()}:{path}'
+
+
+def feed_etag(request, *args, **kwargs):
+    return f'api-{feed_cache.get_generation()}'
+
+
+@condition(etag_func=feed_etag)
+def index(request):
+    return json_response(
+        lambda: post_list(request, Post.objects.all()),
+        feed_cache_key(request),
+    )
+
+
+@condition(etag_func=feed_etag)
+def group_posts(request, slug):
+    def build():
+        group = get_object_or_404(Group, slug=slug)
+        return dict(
+            post_list(request, group.posts.all()),
+            group={
+                'slug': group.slug,
+                'title': group.title,
+                'description': group.description,
+                'posts_count': group.posts_count,
+            },
+        )
+    return json_response(build, feed_cache_key(request))
+
+
+@condition(etag_func=feed_etag)
+def profile(request, username):
+    def build():
+        author = get_object_or_404(
+            User.objects.select_related('counters'), username=username
+        )
+        return dict(
+            post_list(request, Post.objects.filter(author=author)),
+            author={
+                'username': author.username,
+                'full_name': author.get_full_name(),
+                'posts_count': counters.for_user(author).posts_count,
+            },
+        )
+    return json_response(build, feed_cache_key(request))
+
+
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({'detail': 'Нужна авторизация'}, status=401)
+    return json_response(
+        lambda: post_list(request, timeline.get_posts(request.user))
+    )
+
+
+@condition(etag_func=conditions.post_etag)
+def post_detail(request, post_id):
+    def build():
+        fields = parse_fields(request)
+        post = get_object_or_404(
+            select_fields(Post.objects.all(), fields), id=post_id
+        )
+        comments = comments_page(post.comments, request.GET.get('cursor'))
+        return {
+            'post': serialize_post(post, fields),
+            'comments': {
+                'results': [
+                    {
+                        'id': comment.id,
+                        'author': comment.author.username,
+                        'text': comment.text,
+                        'created': comment.created,
+                    }
+                    for comment in comments
+                ],
+                'next': page_link(request, comments.next_cursor),
+            },
+        }
+    return json_response(build)
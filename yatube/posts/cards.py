@@ -0,0 +1,48 @@
+"""Кэш готовой разметки карточек постов.
+
+Карточка одинакова на главной, в группе, в профиле и в подписках, поэтому
+кэшируется отдельно от лент. В ключ входят время изменения поста и всё,
+что карточка показывает из автора и группы: правка поста, имени автора
+или slug группы меняет ключ только у затронутых карточек, а лента
+собирается из остальных готовых карточек одним ``get_many``.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+
+
+def card_key(post, show_author=True):
+    version = '|'.join(map(str, (
+        post.updated.timestamp(),
+        post.author.username,
+        post.author.get_full_name(),
+        post.group.slug if post.group_id else '',
+        int(show_author),
+    )))
+    digest = hashlib.md5(version.encode()).hexdigest()
+    return f'posts:card:{post.id}:{digest}'
+
+
+def render_cards(posts, show_author=True):
+    """HTML карточек в порядке ``posts``; недостающие рендерятся и кэшируются.
+
+    Посты должны быть загружены с автором и группой (``for_feed()``).
+    """
+    posts = list(posts)
+    keys = [card_key(post, show_author) for post in posts]
+    cards = cache.get_many(keys)
+    rendered = {
+        key: render_to_string(
+            CARD_TEMPLATE, {'post': post, 'show_author': show_author}
+        )
+        for key, post in zip(keys, posts) if key not in cards
+    }
+    if rendered:
+        cache.set_many(rendered, settings.POST_CARD_CACHE_TIMEOUT)
+        cards.update(rendered)
+    return [mark_safe(cards[key]) for key in keys]
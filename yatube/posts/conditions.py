@@ -0,0 +1,96 @@
+"""Валидаторы условных GET-запросов для лент и страницы поста.
+
+ETag складывается из поколения лент (меняется при любой правке постов,
+групп и авторов), пользователя, для которого отрисована страница, и
+состояния, которое поколение не покрывает: счётчиков и подписки на
+странице профиля, комментариев на странице поста. Проверка стоит не
+больше двух коротких запросов, поэтому ``304`` отдаётся без запроса
+страницы и рендеринга шаблонов.
+
+``Last-Modified`` отдаётся только анонимам: при входе и выходе время
+изменения страницы не меняется, а клиент без ``If-None-Match``
+получил бы чужой вариант страницы.
+"""
+import hashlib
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from . import counters, feed_cache
+from .models import Comment, Follow, User
+
+
+def _viewer(request):
+    if not request.user.is_authenticated:
+        return 'anon'
+    # Форма комментария несёт CSRF-токен, который меняется при входе.
+    return request.user.pk, request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+
+
+def _etag(*parts):
+    return hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+def feed_etag(request, *args, **kwargs):
+    return _etag('feed', feed_cache.get_generation(), _viewer(request))
+
+
+def feed_last_modified(request, *args, **kwargs):
+    if request.user.is_authenticated:
+        return None
+    return feed_cache.get_last_changed()
+
+
+def profile_author(request, username):
+    """Автор профиля со счётчиками; запрашивается один раз на запрос."""
+    if not hasattr(request, '_profile_author'):
+        request._profile_author = User.objects.select_related(
+            'counters'
+        ).filter(username=username).first()
+    return request._profile_author
+
+
+def is_following(request, author):
+    if not request.user.is_authenticated or author is None:
+        return False
+    if not hasattr(request, '_profile_following'):
+        request._profile_following = Follow.objects.filter(
+            user=request.user, author=author
+        ).exists()
+    return request._profile_following
+
+
+def profile_etag(request, username):
+    author = profile_author(request, username)
+    author_counters = author and counters.for_user(author)
+    return _etag(
+        'profile', feed_cache.get_generation(), _viewer(request),
+        author_counters and author_counters.followers_count,
+        author_counters and author_counters.following_count,
+        is_following(request, author),
+    )
+
+
+def _comments_state(request, post_id):
+    """Число и время последнего комментария, один запрос на запрос."""
+    if not hasattr(request, '_post_comments_state'):
+        request._post_comments_state = Comment.objects.filter(
+            post_id=post_id
+        ).aggregate(count=Count('id'), last=Max('created'))
+    return request._post_comments_state
+
+
+def post_etag(request, post_id):
+    comments = _comments_state(request, post_id)
+    return _etag(
+        'post', feed_cache.get_generation(), _viewer(request),
+        comments['count'], comments['last'],
+    )
+
+
+def post_last_modified(request, post_id):
+    changed = feed_last_modified(request)
+    if changed is None:
+        return None
+    last_comment = _comments_state(request, post_id)['last']
+    return max(changed, last_comment) if last_comment else changed
@@ -0,0 +1,80 @@
+"""Денормализованные счётчики постов, комментариев и подписок."""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, User, UserCounters
+
+
+def change_user(user_id, **deltas):
+    """Сдвигает счётчики пользователя, например ``posts_count=1``."""
+    # Не уводим счётчик ниже нуля, даже если он успел разойтись с базой.
+    floor = {
+        f'{field}__gte': -delta for field, delta in deltas.items() if delta < 0
+    }
+    updated = UserCounters.objects.filter(user_id=user_id, **floor).update(**{
+        field: F(field) + delta for field, delta in deltas.items()
+    })
+    if not updated and any(delta > 0 for delta in deltas.values()):
+        # Строки ещё нет: считаем счётчики по базе, включая этот объект.
+        recount_users(User.objects.filter(id=user_id))
+
+
+def change_group(group_id, delta):
+    if group_id is not None:
+        floor = {'posts_count__gte': -delta} if delta < 0 else {}
+        Group.objects.filter(id=group_id, **floor).update(
+            posts_count=F('posts_count') + delta
+        )
+
+
+def for_user(user):
+    """Счётчики пользователя; недостающая строка создаётся пересчётом."""
+    try:
+        return user.counters
+    except UserCounters.DoesNotExist:
+        recount_users(User.objects.filter(id=user.id))
+        user.counters = UserCounters.objects.get(user_id=user.id)
+        return user.counters
+
+
+def recount_users(users=None):
+    """Пересчитывает счётчики пользователей; возвращает их число."""
+    if users is None:
+        users = User.objects.all()
+    users = users.annotate(
+        counted_posts=_count(Post, 'author'),
+        counted_comments=_count(Comment, 'author'),
+        counted_followers=_count(Follow, 'author'),
+        counted_following=_count(Follow, 'user'),
+    ).values_list(
+        'id', 'counted_posts', 'counted_comments',
+        'counted_followers', 'counted_following',
+    )
+    recounted = 0
+    for user_id, posts, comments, followers, following in users.iterator():
+        UserCounters.objects.update_or_create(user_id=user_id, defaults={
+            'posts_count': posts,
+            'comments_count': comments,
+            'followers_count': followers,
+            'following_count': following,
+        })
+        recounted += 1
+    return recounted
+
+
+def recount_groups():
+    """Пересчитывает число постов в группах; возвращает число групп."""
+    groups = Group.objects.annotate(
+        counted_posts=_count(Post, 'group')
+    ).values_list('id', 'counted_posts')
+    recounted = 0
+    for group_id, posts in groups.iterator():
+        Group.objects.filter(id=group_id).update(posts_count=posts)
+        recounted += 1
+    return recounted
+
+
+def _count(model, field):
+    counted = model.objects.filter(**{field: OuterRef('pk')}).order_by(
+    ).values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counted), 0)
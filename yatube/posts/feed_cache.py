@@ -0,0 +1,95 @@
+"""Поколения кэша лент.
+
+Фрагменты лент кэшируются с ключом, в который входит номер поколения.
+Любое изменение поста увеличивает поколение, поэтому старые фрагменты
+перестают использоваться сразу, а не по истечении таймаута.
+Вместе с поколением хранится время последнего изменения для
+заголовка ``Last-Modified``.
+
+Кроме общего поколения есть поколения областей (``group:<slug>``,
+``author:<username>``): они меняются только от постов своей группы или
+автора, поэтому кэш Atom-ленты группы живёт до следующего поста в ней.
+
+Изменения сбрасывают поколения через ``invalidate``: внутри транзакции
+сброс повторяется после коммита, иначе конкурентный запрос успел бы
+собрать новое поколение из ещё не закоммиченных данных.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+GENERATION_KEY = 'posts:feed_generation'
+CHANGED_KEY = 'posts:feed_changed'
+
+
+def scope_key(scope):
+    """Часть ключа кэша для области.
+
+    Slug и имя пользователя бывают не-ASCII, а memcached принимает только
+    ASCII-ключи без пробелов, поэтому область хешируется.
+    """
+    if scope is None:
+        return 'all'
+    return hashlib.md5(scope.encode()).hexdigest()
+
+
+def _key(scope):
+    if scope is None:
+        return GENERATION_KEY
+    return f'{GENERATION_KEY}:{scope_key(scope)}'
+
+
+def get_generation(scope=None):
+    key = _key(scope)
+    generation = cache.get(key)
+    if generation is None:
+        # Стартуем с метки времени, чтобы после вытеснения ключа из кэша
+        # не повторить номер поколения, под которым ещё лежат фрагменты.
+        cache.add(key, int(time.time() * 1000), None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(scope=None):
+    try:
+        cache.incr(_key(scope))
+    except ValueError:
+        get_generation(scope)
+    if scope is None:
+        cache.set(CHANGED_KEY, time.time(), None)
+
+
+def invalidate(*scopes):
+    """Сбрасывает общее поколение и поколения ``scopes``."""
+    def bump():
+        bump_generation()
+        for scope in scopes:
+            bump_generation(scope)
+
+    bump()
+    if connection.in_atomic_block:
+        transaction.on_commit(bump)
+
+
+def post_scopes(post):
+    """Области, которые затрагивает изменение поста."""
+    scopes = [f'author:{post.author.username}']
+    if post.group_id is not None:
+        scopes.append(f'group:{post.group.slug}')
+    return scopes
+
+
+def get_last_changed():
+    """Время последнего изменения лент.
+
+    Если ключ вытеснен из кэша, изменением считается текущий момент: так
+    клиенты перезапросят страницу, а не получат устаревшую.
+    """
+    changed = cache.get(CHANGED_KEY)
+    if changed is None:
+        cache.add(CHANGED_KEY, time.time(), None)
+        changed = cache.get(CHANGED_KEY)
+    return datetime.fromtimestamp(changed, timezone.utc)
@@ -0,0 +1,121 @@
+"""Atom-ленты: все посты, посты группы и посты автора.
+
+Готовый XML кэшируется по поколению своей области (``feed_cache``) и
+отдаёт ETag из того же поколения. Опрос ленты, в которой ничего не
+менялось, стоит одного чтения кэша и ответа 304 без запросов к базе.
+"""
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.views.decorators.http import condition
+
+from core import routers
+
+from . import feed_cache
+from .models import Group, Post, User
+
+ITEMS_PER_FEED = 20
+
+
+class LatestPosts(Feed):
+    feed_type = Atom1Feed
+    title = 'Yatube: последние записи'
+    subtitle = 'Новые записи всех авторов'
+
+    def link(self):
+        return reverse('posts:main')
+
+    def items(self):
+        return Post.objects.for_feed()[:ITEMS_PER_FEED]
+
+    def item_title(self, item):
+        return item.text[:50]
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', kwargs={'post_id': item.id})
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_categories(self, item):
+        return [item.group.title] if item.group else []
+
+
+class GroupPosts(LatestPosts):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, group):
+        return f'Yatube: записи сообщества {group.title}'
+
+    def subtitle(self, group):
+        return group.description
+
+    def link(self, group):
+        return reverse('posts:url_group', kwargs={'slug': group.slug})
+
+    def items(self, group):
+        return group.posts.for_feed()[:ITEMS_PER_FEED]
+
+
+class AuthorPosts(LatestPosts):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, author):
+        return f'Yatube: записи {author.get_full_name() or author.username}'
+
+    def subtitle(self, author):
+        return f'Все записи пользователя {author.username}'
+
+    def link(self, author):
+        return reverse('posts:profile', kwargs={'username': author.username})
+
+    def items(self, author):
+        return Post.objects.filter(author=author).for_feed()[
+            :ITEMS_PER_FEED
+        ]
+
+
+def cached_feed(feed, scope):
+    """View ленты с кэшем XML и ETag по поколению области ``scope``."""
+
+    def generation(kwargs):
+        return feed_cache.get_generation(scope(**kwargs))
+
+    def etag(request, **kwargs):
+        return f'atom-{generation(kwargs)}'
+
+    @condition(etag_func=etag)
+    def view(request, **kwargs):
+        key = (
+            f'posts:atom:{feed_cache.scope_key(scope(**kwargs))}:'
+            f'{generation(kwargs)}'
+        )
+        cached = cache.get(key)
+        if cached is None:
+            with routers.primary():
+                response = feed(request, **kwargs)
+            cached = (response.content, response['Content-Type'])
+            cache.set(key, cached, settings.ATOM_CACHE_TIMEOUT)
+        content, content_type = cached
+        return HttpResponse(content, content_type=content_type)
+
+    return view
+
+
+latest_posts = cached_feed(LatestPosts(), lambda: None)
+group_posts = cached_feed(GroupPosts(), lambda slug: f'group:{slug}')
+author_posts = cached_feed(
+    AuthorPosts(), lambda username: f'author:{username}'
+)
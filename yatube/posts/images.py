@@ -0,0 +1,77 @@
+"""Счётчики ссылок постов на файлы картинок.
+
+Одинаковые загрузки делят один файл (см. ``posts.storage``), поэтому
+файл и его миниатюры удаляются, только когда на него не ссылается ни один
+пост. Ссылку на загруженный файл берёт само хранилище, остальные
+изменения ведут сигналы ``Post``; после массовой загрузки счётчики
+восстанавливает ``recount()``.
+"""
+from django.db import transaction
+from django.db.models import Count, F
+from sorl.thumbnail import delete as delete_with_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+from core import locks
+
+from .models import Post, StoredImage
+from .storage import is_content_addressed
+
+
+def retain(name):
+    if not name:
+        return
+    updated = StoredImage.objects.filter(name=name).update(
+        references=F('references') + 1
+    )
+    if not updated:
+        StoredImage.objects.bulk_create(
+            [StoredImage(name=name, references=0)], ignore_conflicts=True
+        )
+        StoredImage.objects.filter(name=name).update(
+            references=F('references') + 1
+        )
+
+
+def release(name):
+    """Снимает ссылку; последняя ссылка удаляет файл после коммита."""
+    if not name:
+        return
+    StoredImage.objects.filter(name=name, references__gt=0).update(
+        references=F('references') - 1
+    )
+    deleted, _ = StoredImage.objects.filter(
+        name=name, references=0
+    ).delete()
+    if deleted:
+        transaction.on_commit(lambda: discard(name))
+
+
+def discard(name):
+    """Удаляет файл и миниатюры, если на него так и не сослались снова."""
+    if not is_content_addressed(name):
+        # Файлы, сохранённые не этим хранилищем, могут быть чужими.
+        return
+    storage = Post._meta.get_field('image').storage
+    with transaction.atomic():
+        # Ждём транзакции, которые сохранили этот файл, но ещё не
+        # закоммитили свою ссылку.
+        locks.lock_table(StoredImage)
+        if StoredImage.objects.filter(name=name).exists():
+            return
+        delete_with_thumbnails(ImageFile(name, storage))
+
+
+def recount():
+    """Пересчитывает ссылки по постам; возвращает число файлов."""
+    counted = dict(
+        Post.objects.exclude(image='').values_list('image').annotate(
+            total=Count('id')
+        ).order_by()
+    )
+    with transaction.atomic():
+        StoredImage.objects.exclude(name__in=counted).delete()
+        for name, total in counted.items():
+            StoredImage.objects.update_or_create(
+                name=name, defaults={'references': total}
+            )
+    return len(counted)
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+from posts.models import Follow, User
+
+
+class Command(BaseCommand):
+    help = 'Заново собирает предрассчитанные ленты подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Пользователи, чьи ленты нужно собрать (по умолчанию все).',
+        )
+        parser.add_argument(
+            '--trim-only', action='store_true',
+            help='Только обрезать ленты до TIMELINE_LENGTH записей.',
+        )
+        parser.add_argument(
+            '--push-back-only', action='store_true',
+            help='Только разложить посты авторов, у которых подписчиков '
+                 'снова не больше TIMELINE_FANOUT_LIMIT (для cron).',
+        )
+
+    def handle(self, *args, **options):
+        pushed = timeline.push_back_authors()
+        self.stdout.write(f'Возвращено к раскладке авторов: {pushed}')
+        if options['push_back_only']:
+            return
+        users = User.objects.filter(
+            id__in=Follow.objects.values('user_id')
+        )
+        if options['usernames']:
+            users = User.objects.filter(username__in=options['usernames'])
+        action = timeline.trim if options['trim_only'] else timeline.rebuild
+        done = 0
+        for user_id in users.values_list('id', flat=True).iterator():
+            action(user_id)
+            done += 1
+        self.stdout.write(self.style.SUCCESS(f'Обработано лент: {done}'))
@@ -0,0 +1,41 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты, комментарии и подписки в NDJSON или CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-o', '--output',
+            help='Файл выгрузки (по умолчанию стандартный вывод).',
+        )
+        parser.add_argument(
+            '--format', choices=('ndjson', 'csv'), default='ndjson',
+        )
+        parser.add_argument(
+            '--type', choices=transfer.KINDS, action='append', dest='kinds',
+            help='Вид записей; для CSV обязателен и может быть только один.',
+        )
+
+    def handle(self, *args, **options):
+        kinds = options['kinds'] or list(transfer.KINDS)
+        if options['format'] == 'csv' and len(kinds) != 1:
+            raise CommandError('Для CSV укажите ровно один --type.')
+        output = options['output']
+        stream = (
+            open(output, 'w', encoding='utf-8', newline='')
+            if output else sys.stdout
+        )
+        try:
+            if options['format'] == 'csv':
+                written = transfer.write_csv(stream, kinds[0])
+            else:
+                written = transfer.write_ndjson(stream, kinds)
+        finally:
+            if output:
+                stream.close()
+        self.stderr.write(f'Выгружено записей: {written}')
@@ -0,0 +1,91 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = 'Загружает посты, комментарии и подписки из NDJSON или CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл выгрузки.')
+        parser.add_argument(
+            '--format', choices=('ndjson', 'csv'),
+            help='Формат файла (по умолчанию по расширению).',
+        )
+        parser.add_argument(
+            '--type', choices=transfer.KINDS, default='post',
+            help='Вид записей в CSV-файле.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Записей в одной пачке bulk_create и транзакции.',
+        )
+        parser.add_argument(
+            '--media-dir',
+            help='Каталог, откуда копировать картинки постов.',
+        )
+        parser.add_argument(
+            '--post-ids',
+            help='JSON-файл соответствия id постов выгрузки и базы: '
+                 'читается перед загрузкой и дополняется после неё.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or (
+            'csv' if path.endswith('.csv') else 'ndjson'
+        )
+        if options['media_dir'] and not os.path.isdir(options['media_dir']):
+            raise CommandError(f'Нет каталога {options["media_dir"]}')
+        post_ids_path = options['post_ids']
+        if (file_format == 'csv' and options['type'] == 'comment'
+                and not post_ids_path):
+            raise CommandError(
+                'Комментарии из CSV ссылаются на посты другого файла: '
+                'укажите --post-ids, с которым загружались посты.'
+            )
+        importer = transfer.Importer(
+            batch_size=options['batch_size'],
+            media_dir=options['media_dir'],
+            progress=self.report_progress,
+            post_ids=self.read_post_ids(post_ids_path),
+        )
+        started = time.monotonic()
+        with open(path, encoding='utf-8', newline='') as stream:
+            if file_format == 'csv':
+                records = transfer.read_csv(stream, options['type'])
+            else:
+                records = transfer.read_ndjson(stream)
+            for record in records:
+                importer.add(record)
+            imported = importer.finish()
+        if post_ids_path:
+            with open(post_ids_path, 'w', encoding='utf-8') as stream:
+                json.dump(importer.post_ids, stream)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено постов: {imported["post"]}, '
+            f'комментариев: {imported["comment"]}, '
+            f'подписок: {imported["follow"]} за {elapsed:.1f} с'
+        ))
+        skipped = importer.skipped
+        if skipped:
+            self.stdout.write(self.style.WARNING(
+                'Пропущено: ' + ', '.join(
+                    f'{kind}: {count}' for kind, count in skipped.items()
+                )
+            ))
+
+    @staticmethod
+    def read_post_ids(path):
+        if not path or not os.path.exists(path):
+            return {}
+        with open(path, encoding='utf-8') as stream:
+            return json.load(stream)
+
+    def report_progress(self, kind, done, rate):
+        self.stderr.write(f'{kind}: {done} ({rate:.0f} записей/с)')
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+
+from posts.models import Post
+from posts.thumbnails import GEOMETRIES
+
+
+class Command(BaseCommand):
+    help = 'Синхронно готовит миниатюры всех картинок постов.'
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').only('image')
+        done = 0
+        for post in posts.iterator():
+            for geometry_string, thumbnail_options in GEOMETRIES:
+                default.backend.render(
+                    post.image, geometry_string, **thumbnail_options
+                )
+            done += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Подготовлены миниатюры для постов: {done}'
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters, images
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает денормализованные счётчики пользователей, групп и '
+        'ссылок на картинки.'
+    )
+
+    def handle(self, *args, **options):
+        users = counters.recount_users()
+        groups = counters.recount_groups()
+        files = images.recount()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано пользователей: {users}, групп: {groups}, '
+            f'картинок: {files}'
+        ))
@@ -0,0 +1,59 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts import thumbnails
+from posts.models import ThumbnailJob
+
+
+def run_job(job):
+    try:
+        return thumbnails.run_job(job)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Разбирает очередь миниатюр пулом потоков.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.THUMBNAIL_WORKERS,
+            help='Число потоков, генерирующих миниатюры.',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=2.0,
+            help='Пауза в секундах, когда очередь пуста.',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать очередь и завершиться.',
+        )
+        parser.add_argument(
+            '--retry-failed', action='store_true',
+            help='Вернуть в очередь задачи, исчерпавшие попытки.',
+        )
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            ThumbnailJob.objects.update(attempts=0, claimed=None)
+        workers = options['workers']
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='thumbnails'
+        ) as pool:
+            while True:
+                jobs = thumbnails.claim_jobs(workers * 4)
+                if jobs:
+                    started = time.monotonic()
+                    done = sum(pool.map(run_job, jobs))
+                    self.stdout.write(
+                        f'Миниатюр готово: {done} из {len(jobs)} '
+                        f'за {time.monotonic() - started:.2f} с'
+                    )
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['poll_interval'])
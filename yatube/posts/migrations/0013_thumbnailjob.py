@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThumbnailJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=32, unique=True, verbose_name='Ключ миниатюры')),
+                ('source', models.CharField(max_length=255, verbose_name='Исходная картинка')),
+                ('geometry', models.CharField(max_length=32, verbose_name='Размер')),
+                ('options', models.TextField(verbose_name='Параметры sorl-thumbnail')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата постановки')),
+                ('claimed', models.DateTimeField(blank=True, null=True, verbose_name='Взята в работу')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попытки')),
+            ],
+            options={
+                'ordering': ['created'],
+            },
+        ),
+    ]
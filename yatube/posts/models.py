@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -8,11 +10,20 @@ class Group(models.Model):
     title = models.CharField('title group', max_length=200)
     slug = models.SlugField('uniq address group', unique=True)
     description = models.TextField('text Area group')
+    posts_count = models.PositiveIntegerField(
+        'Число постов', default=0, editable=False
+    )
 
     def __str__(self) -> str:
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для лент: автор и группа подтягиваются одним JOIN."""
+        return self.select_related('author', 'group')
+
+
 class Post(models.Model):
     text = models.TextField(
         'Текст поста',
@@ -22,6 +33,10 @@ class Post(models.Model):
         'Дата публикации',
         auto_now_add=True
     )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -39,11 +54,25 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
 
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date'], name='posts_post_author_date',
+            ),
+            models.Index(
+                fields=['group', '-pub_date'], name='posts_post_group_date',
+            ),
+            models.Index(
+                fields=['-pub_date', '-id'], name='posts_post_date_id',
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.text[:15]
@@ -69,6 +98,14 @@ class Comment(models.Model):
         auto_now_add=True
     )
 
+    class Meta:
+        ordering = ['created']
+        indexes = [
+            models.Index(
+                fields=['post', 'created'], name='posts_comment_post_created',
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -81,3 +118,89 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name='following',
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='posts_follow_unique',
+            ),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Запись предрассчитанной ленты подписок пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    pub_date = models.DateTimeField('Дата публикации поста')
+
+    class Meta:
+        ordering = ['-pub_date']
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date'],
+                name='posts_timeline_user_date',
+            ),
+        ]
+
+
+class UserCounters(models.Model):
+    """Денормализованные счётчики пользователя.
+
+    Поддерживаются сигналами на создание и удаление ``Post``, ``Comment``
+    и ``Follow``; расхождения исправляет команда ``recount``.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев', default=0
+    )
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков', default=0, db_index=True
+    )
+    following_count = models.PositiveIntegerField('Число подписок', default=0)
+    # Посты автора не раскладываются по лентам, а подмешиваются при чтении
+    # (см. posts.timeline); сбрасывает флаг только build_timelines.
+    pulled = models.BooleanField(
+        'Подмешивается при чтении', default=False, db_index=True
+    )
+
+
+class ThumbnailJob(models.Model):
+    """Задача на генерацию миниатюры для фонового обработчика."""
+
+    key = models.CharField('Ключ миниатюры', max_length=32, unique=True)
+    source = models.CharField('Исходная картинка', max_length=255)
+    geometry = models.CharField('Размер', max_length=32)
+    options = models.TextField('Параметры sorl-thumbnail')
+    created = models.DateTimeField('Дата постановки', auto_now_add=True)
+    claimed = models.DateTimeField('Взята в работу', null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField('Попытки', default=0)
+
+    class Meta:
+        ordering = ['created']
+
+
+class StoredImage(models.Model):
+    """Файл картинки и число постов, которые на него ссылаются."""
+
+    name = models.CharField('Файл', max_length=255, unique=True)
+    references = models.PositiveIntegerField('Число ссылок', default=0)
+
+    def __str__(self) -> str:
+        return self.name
@@ -0,0 +1,167 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+
+
+class CursorPage(Page):
+    """Страница keyset-пагинации: вместо номера хранит курсоры соседей.
+
+    Строки выбираются при первом обращении, поэтому страница, чья
+    разметка нашлась в кэше фрагментов, базу не трогает.
+    """
+
+    is_cursor = True
+
+    def __init__(self, cursor, paginator):
+        self.cursor = cursor
+        self.number = None
+        self.paginator = paginator
+        self._rows = None
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def _fetch(self):
+        if self._rows is None:
+            self._rows = self.paginator.fetch_page(self.cursor)
+        return self._rows
+
+    @property
+    def object_list(self):
+        return self._fetch()[0]
+
+    def has_next(self):
+        return self._fetch()[1]
+
+    def has_previous(self):
+        return self._fetch()[2]
+
+    @property
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        return self.paginator.encode_cursor(self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous():
+            return None
+        return self.paginator.encode_cursor(
+            self.object_list[0], backwards=True
+        )
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по упорядоченному набору полей.
+
+    Страница выбирается условием ``WHERE (pub_date, id) < (...)`` вместо
+    ``OFFSET``, поэтому глубокие страницы стоят столько же, сколько первая,
+    а ``COUNT(*)`` не выполняется вовсе. Все поля ``ordering`` должны
+    сортироваться в одну сторону, последнее поле должно быть уникальным.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        super().__init__(object_list, per_page)
+        self.ordering = tuple(ordering)
+        self.descending = self.ordering[0].startswith('-')
+        self.fields = tuple(name.lstrip('-') for name in self.ordering)
+
+    def encode_cursor(self, obj, backwards=False):
+        values = [
+            self._field(name).value_to_string(obj) for name in self.fields
+        ]
+        raw = json.dumps({'v': values, 'b': backwards}).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Возвращает (значения, backwards) или (None, False)."""
+        if not cursor:
+            return None, False
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            data = json.loads(raw.decode())
+            values = [
+                self._field(name).to_python(value)
+                for name, value in zip(self.fields, data['v'])
+            ]
+            backwards = bool(data.get('b'))
+        except (binascii.Error, ValueError, KeyError, TypeError,
+                ValidationError):
+            return None, False
+        if len(values) != len(self.fields) or None in values:
+            return None, False
+        return values, backwards
+
+    def get_page(self, cursor):
+        """Страница после (или перед) курсором; битый курсор даёт первую."""
+        return CursorPage(cursor, self)
+
+    def fetch_page(self, cursor):
+        """Строки страницы и флаги соседей: (rows, has_next, has_previous)."""
+        values, backwards = self.decode_cursor(cursor)
+        if values is None:
+            return self._split(self._fetch(), has_previous=False)
+        rows = self._fetch(self._keyset(values, backwards), backwards)
+        has_more = len(rows) > self.per_page
+        if not backwards:
+            return self._split(rows, has_previous=True)
+        if not has_more:
+            # Дошли до начала ленты: отдаём полноценную первую страницу.
+            return self._split(self._fetch(), has_previous=False)
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return rows, True, True
+
+    def _split(self, rows, has_previous):
+        return rows[:self.per_page], len(rows) > self.per_page, has_previous
+
+    def _fetch(self, condition=None, backwards=False):
+        queryset = self.object_list
+        if condition is not None:
+            queryset = queryset.filter(condition)
+        ordering = self.ordering
+        if backwards:
+            ordering = [self._flip(name) for name in ordering]
+        return list(queryset.order_by(*ordering)[:self.per_page + 1])
+
+    def _keyset(self, values, backwards):
+        lookup = 'lt' if self.descending != backwards else 'gt'
+        condition = Q()
+        for index, name in enumerate(self.fields):
+            equal = dict(zip(self.fields[:index], values[:index]))
+            equal[f'{name}__{lookup}'] = values[index]
+            condition |= Q(**equal)
+        return condition
+
+    def _field(self, name):
+        return self.object_list.model._meta.get_field(name)
+
+    @staticmethod
+    def _flip(name):
+        return name[1:] if name.startswith('-') else f'-{name}'
+
+
+def uses_cursor(request):
+    """Листается ли лента курсором, а не номером страницы."""
+    return settings.POSTS_CURSOR_PAGINATION or 'cursor' in request.GET
+
+
+def paginate(request, queryset, per_page, count=None):
+    """Отдаёт страницу ленты: по номеру или, если включено, по курсору.
+
+    Курсорный режим включается настройкой ``POSTS_CURSOR_PAGINATION``
+    или параметром ``?cursor=`` в запросе. Известный заранее ``count``
+    избавляет постраничный режим от ``COUNT(*)``.
+    """
+    if uses_cursor(request):
+        paginator = CursorPaginator(queryset, per_page)
+        return paginator.get_page(request.GET.get('cursor'))
+    paginator = Paginator(queryset, per_page)
+    if count is not None:
+        paginator.count = count
+    return paginator.get_page(request.GET.get('page'))
@@ -0,0 +1,86 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+Индекс хранится в отдельной таблице ``posts_post_fts`` (rowid совпадает с
+id поста) и обновляется сигналами: триггеры на ``posts_post`` SQLite
+теряет, когда миграции пересоздают таблицу. На других СУБД поиск
+откатывается к ``icontains``.
+"""
+import re
+
+from django.db import connection
+
+FTS_TABLE = 'posts_post_fts'
+TOKEN_RE = re.compile(r'\w+')
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def build_match(query):
+    """Превращает ввод пользователя в безопасный запрос FTS5.
+
+    Каждое слово берётся в кавычки (операторы FTS5 не срабатывают), слова
+    объединяются через AND, последнее ищется по префиксу.
+    """
+    tokens = TOKEN_RE.findall(query.lower())
+    if not tokens:
+        return ''
+    return ' '.join(f'"{token}"' for token in tokens) + '*'
+
+
+def search_posts(queryset, query, ranked=True):
+    """Посты, подходящие под запрос; по умолчанию лучшие совпадения первыми."""
+    match = build_match(query)
+    if not match:
+        return queryset.none()
+    if not is_available():
+        for token in TOKEN_RE.findall(query):
+            queryset = queryset.filter(text__icontains=token)
+        return queryset
+    table = queryset.model._meta.db_table
+    queryset = queryset.extra(
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE}.rowid = {table}.id', f'{FTS_TABLE} MATCH %s'],
+        params=[match],
+    )
+    if ranked:
+        queryset = queryset.extra(
+            select={'search_rank': f'{FTS_TABLE}.rank'},
+            order_by=['search_rank'],
+        )
+    return queryset
+
+
+def index_post(post):
+    if is_available():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk]
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+                [post.pk, post.text],
+            )
+
+
+def unindex_post(post_id):
+    if is_available():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id]
+            )
+
+
+def rebuild():
+    """Заполняет индекс заново по всем постам; возвращает их число."""
+    if not is_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) '
+            f'SELECT id, text FROM posts_post'
+        )
+        cursor.execute(f'SELECT COUNT(*) FROM {FTS_TABLE}')
+        return cursor.fetchone()[0]
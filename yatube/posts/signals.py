@@ -0,0 +1,176 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import counters, feed_cache, images, search, thumbnails, timeline
+from .models import Comment, Follow, Group, Post, User
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_feeds(sender, instance, raw=False, **kwargs):
+    if raw:
+        feed_cache.invalidate()
+        return
+    scopes = feed_cache.post_scopes(instance)
+    old_group_id = getattr(instance, '_old_group_id', None)
+    if old_group_id not in (None, instance.group_id):
+        old_slug = Group.objects.filter(
+            id=old_group_id
+        ).values_list('slug', flat=True).first()
+        scopes.append(f'group:{old_slug}')
+    feed_cache.invalidate(*scopes)
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_slug(sender, instance, raw=False, **kwargs):
+    instance._old_slug = None
+    if instance.pk and not raw:
+        instance._old_slug = Group.objects.filter(
+            pk=instance.pk
+        ).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_feeds(sender, instance, **kwargs):
+    scopes = [f'group:{instance.slug}']
+    # Лента по прежнему slug должна перестать отдаваться из кэша.
+    old_slug = getattr(instance, '_old_slug', None)
+    if old_slug not in (None, instance.slug):
+        scopes.append(f'group:{old_slug}')
+    feed_cache.invalidate(*scopes)
+
+
+@receiver(pre_save, sender=User)
+def remember_username(sender, instance, raw=False, update_fields=None,
+                      **kwargs):
+    instance._old_username = None
+    if update_fields is not None and 'username' not in update_fields:
+        return
+    if instance.pk and not raw:
+        instance._old_username = User.objects.filter(
+            pk=instance.pk
+        ).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_feeds_on_author_change(sender, instance, update_fields=None,
+                                      **kwargs):
+    # Вход пользователя обновляет только last_login, ленты от него не зависят.
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    scopes = [f'author:{instance.username}']
+    old_username = getattr(instance, '_old_username', None)
+    if old_username not in (None, instance.username):
+        scopes.append(f'author:{old_username}')
+    feed_cache.invalidate(*scopes)
+
+
+@receiver(post_save, sender=Follow)
+def add_followed_author(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.add_author(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def remove_followed_author(sender, instance, **kwargs):
+    timeline.remove_author(instance.user_id, instance.author_id)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_state(sender, instance, raw=False, **kwargs):
+    instance._old_group_id = None
+    instance._old_image = None
+    # Ссылку на новую загрузку возьмёт хранилище при сохранении файла.
+    instance._uploading = bool(instance.image) and not (
+        instance.image._committed
+    )
+    if instance.pk and not raw:
+        instance._old_group_id, instance._old_image = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', 'image').first() or (None, None)
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.change_user(instance.author_id, posts_count=1)
+        counters.change_group(instance.group_id, 1)
+    elif instance._old_group_id != instance.group_id:
+        counters.change_group(instance._old_group_id, -1)
+        counters.change_group(instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, posts_count=-1)
+    counters.change_group(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Post)
+def reference_image(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    image = instance.image.name or ''
+    old_image = '' if created else instance._old_image or ''
+    if instance._uploading:
+        # Та же картинка, загруженная заново, уже посчитана хранилищем.
+        images.release(old_image)
+    elif image != old_image:
+        images.release(old_image)
+        images.retain(image)
+
+
+@receiver(post_delete, sender=Post)
+def dereference_image(sender, instance, **kwargs):
+    images.release(instance.image.name)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_user(instance.author_id, comments_count=1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, comments_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_user(instance.author_id, followers_count=1)
+        counters.change_user(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, followers_count=-1)
+    counters.change_user(instance.user_id, following_count=-1)
+
+
+@receiver(post_save, sender=Post)
+def index_post_text(sender, instance, raw=False, update_fields=None, **kwargs):
+    if update_fields is None or 'text' in update_fields:
+        search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post_text(sender, instance, **kwargs):
+    search.unindex_post(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def pregenerate_thumbnails(sender, instance, raw=False, **kwargs):
+    if not raw:
+        thumbnails.pregenerate(instance.image)
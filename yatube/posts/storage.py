@@ -0,0 +1,68 @@
+"""Хранилище картинок постов по адресу содержимого.
+
+Файл сохраняется под SHA-256 своего содержимого:
+``posts/ab/ab12…ef.jpg``. Хеш считается по ходу записи загрузки во
+временный файл, без второго прохода. Повторная загрузка той же картинки
+любым пользователем получает то же имя: второй копии на диске нет, а
+миниатюры sorl, ключ которых строится по имени файла, уже готовы.
+Сколько постов ссылается на файл, ведёт ``posts.images``.
+
+Ссылку на файл ``_save`` берёт сам, до проверки, есть ли файл на диске:
+иначе ``images.discard`` другой транзакции мог бы удалить уже
+существующий файл между сохранением загрузки и ``post_save`` поста.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+DIGEST_NAME = re.compile(r'^posts/[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+
+
+def is_content_addressed(name):
+    return bool(name) and DIGEST_NAME.match(name) is not None
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # Настоящее имя станет известно только после хеширования в
+        # _save; одинаковое имя там означает одинаковое содержимое.
+        return name
+
+    def _save(self, name, content):
+        from . import images
+        directory = posixpath.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        os.makedirs(self.path(directory), exist_ok=True)
+        fd, temporary = tempfile.mkstemp(
+            dir=self.path(directory), prefix='.upload-'
+        )
+        try:
+            digest = hashlib.sha256()
+            with os.fdopen(fd, 'wb') as file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    file.write(chunk)
+            digest = digest.hexdigest()
+            name = posixpath.join(directory, digest[:2], digest + extension)
+            path = self.path(name)
+            # Ссылка держит блокировку записи StoredImage до коммита, а
+            # discard проверяет ссылки под этой же блокировкой.
+            images.retain(name)
+            if os.path.exists(path):
+                os.remove(temporary)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(temporary, self.file_permissions_mode)
+                os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return name
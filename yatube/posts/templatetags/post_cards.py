@@ -0,0 +1,14 @@
+from django import template
+
+from posts.cards import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts, show_author=True):
+    """Готовые карточки постов страницы, прочитанные из кэша разом.
+
+    ``{% post_cards page_obj as cards %}``, затем цикл по ``cards``.
+    """
+    return render_cards(posts, show_author)
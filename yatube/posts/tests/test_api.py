@@ -0,0 +1,116 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, text=f'Пост {i}', group=cls.group
+            )
+            for i in range(13)
+        ]
+        cls.posts.reverse()
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_feeds_mirror_html_views(self):
+        '''JSON-ленты отдают те же посты, что и HTML-страницы.'''
+        urls = {
+            reverse('posts:api_index'): self.guest_client,
+            reverse('posts:api_group', kwargs={'slug': 'test_slug'}):
+                self.guest_client,
+            reverse('posts:api_profile', kwargs={'username': 'author'}):
+                self.guest_client,
+            reverse('posts:api_follow_index'): self.reader_client,
+        }
+        expected = [post.id for post in self.posts[:10]]
+        for url, client in urls.items():
+            with self.subTest(url=url):
+                data = client.get(url).json()
+                self.assertEqual(
+                    [post['id'] for post in data['results']], expected
+                )
+                self.assertEqual(data['results'][0]['author'], 'author')
+                self.assertEqual(data['results'][0]['group'], 'test_slug')
+
+    def test_cursor_pagination(self):
+        '''Ссылка next ведёт на следующую порцию ленты.'''
+        data = self.guest_client.get(reverse('posts:api_index')).json()
+        self.assertIsNone(data['previous'])
+        data = self.guest_client.get(data['next']).json()
+        self.assertEqual(
+            [post['id'] for post in data['results']],
+            [post.id for post in self.posts[10:]],
+        )
+        self.assertIsNone(data['next'])
+
+    def test_sparse_fieldset(self):
+        '''fields= оставляет только запрошенные поля и не грузит связи.'''
+        url = reverse('posts:api_index')
+        with CaptureQueriesContext(connection) as queries:
+            data = self.guest_client.get(url, {'fields': 'id,text'}).json()
+        self.assertEqual(set(data['results'][0]), {'id', 'text'})
+        self.assertFalse(any(
+            'auth_user' in query['sql'] for query in queries
+        ))
+        response = self.guest_client.get(url, {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_feed_is_cached_per_cursor(self):
+        '''Повторный запрос ленты не обращается к базе до новой записи.'''
+        url = reverse('posts:api_index')
+        first = self.guest_client.get(url).content
+        with self.assertNumQueries(0):
+            self.assertEqual(self.guest_client.get(url).content, first)
+        Post.objects.create(author=self.author, text='Свежий пост')
+        data = self.guest_client.get(url).json()
+        self.assertEqual(data['results'][0]['text'], 'Свежий пост')
+
+    def test_etag_not_modified(self):
+        '''Лента с тем же ETag отвечает 304.'''
+        url = reverse('posts:api_index')
+        etag = self.guest_client.get(url)['ETag']
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_post_detail_with_comments(self):
+        '''Пост отдаётся вместе с первой порцией комментариев.'''
+        data = self.guest_client.get(reverse(
+            'posts:api_post_detail', kwargs={'post_id': self.posts[0].id}
+        )).json()
+        self.assertEqual(data['post']['text'], self.posts[0].text)
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']['results']],
+            ['Комментарий'],
+        )
+
+    def test_follow_requires_login(self):
+        '''Лента подписок без авторизации отвечает 401.'''
+        response = self.guest_client.get(reverse('posts:api_follow_index'))
+        self.assertEqual(response.status_code, 401)
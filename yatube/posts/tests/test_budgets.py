@@ -0,0 +1,134 @@
+from collections import namedtuple
+from importlib import import_module
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from mixer.backend.django import mixer
+
+from core import instrumentation
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+Budget = namedtuple('Budget', 'queries sql_ms render_ms')
+
+# Модули, все именованные маршруты которых обязаны иметь бюджет.
+URL_MODULES = ('posts.urls', 'users.urls', 'about.urls')
+
+# Запросы сессии и пользователя авторизованного клиента входят в бюджет.
+# Время задано с запасом на медленные машины: оно ловит только
+# многократные ухудшения, число запросов проверяется строго.
+BUDGETS = {
+    'posts:main': Budget(queries=4, sql_ms=100, render_ms=400),
+    'posts:url_group': Budget(queries=5, sql_ms=100, render_ms=400),
+    'posts:profile': Budget(queries=6, sql_ms=100, render_ms=400),
+    'posts:profile_export': Budget(queries=5, sql_ms=100, render_ms=0),
+    'posts:post_detail': Budget(queries=5, sql_ms=100, render_ms=400),
+    'posts:post_comments': Budget(queries=2, sql_ms=100, render_ms=200),
+    'posts:post_create': Budget(queries=3, sql_ms=50, render_ms=200),
+    'posts:post_edit': Budget(queries=4, sql_ms=50, render_ms=200),
+    'posts:add_comment': Budget(queries=3, sql_ms=50, render_ms=0),
+    'posts:follow_index': Budget(queries=5, sql_ms=100, render_ms=400),
+    'posts:search': Budget(queries=2, sql_ms=100, render_ms=400),
+    'posts:atom_index': Budget(queries=3, sql_ms=100, render_ms=0),
+    'posts:atom_group': Budget(queries=4, sql_ms=100, render_ms=0),
+    'posts:atom_profile': Budget(queries=4, sql_ms=100, render_ms=0),
+    'posts:api_index': Budget(queries=2, sql_ms=100, render_ms=0),
+    'posts:api_group': Budget(queries=3, sql_ms=100, render_ms=0),
+    'posts:api_profile': Budget(queries=3, sql_ms=100, render_ms=0),
+    'posts:api_follow_index': Budget(queries=4, sql_ms=100, render_ms=0),
+    'posts:api_post_detail': Budget(queries=5, sql_ms=100, render_ms=0),
+    'posts:profile_follow': Budget(queries=6, sql_ms=100, render_ms=0),
+    'posts:profile_unfollow': Budget(queries=8, sql_ms=100, render_ms=0),
+    'users:signup': Budget(queries=2, sql_ms=50, render_ms=200),
+    'about:author': Budget(queries=2, sql_ms=50, render_ms=200),
+    'about:tech': Budget(queries=2, sql_ms=50, render_ms=200),
+}
+
+
+def named_routes():
+    """Имена маршрутов с пространством имён и именами их параметров."""
+    for module_name in URL_MODULES:
+        module = import_module(module_name)
+        for pattern in module.urlpatterns:
+            if pattern.name:
+                yield (
+                    f'{module.app_name}:{pattern.name}',
+                    list(pattern.pattern.converters),
+                )
+
+
+class RouteBudgetTest(TestCase):
+    """Каждый маршрут укладывается в объявленный бюджет."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        authors = mixer.cycle(5).blend(User)
+        groups = mixer.cycle(3).blend(Group)
+        for author in authors:
+            Follow.objects.create(user=cls.reader, author=author)
+        posts = [
+            mixer.blend(
+                Post,
+                author=authors[i % len(authors)],
+                group=groups[i % len(groups)],
+                image=None,
+            )
+            for i in range(60)
+        ]
+        cls.post = mixer.blend(
+            Post, author=cls.reader, group=groups[0], image=None
+        )
+        Comment.objects.bulk_create(
+            Comment(post=post, author=authors[i % len(authors)], text='Ок')
+            for i, post in enumerate(posts[:10] + [cls.post] * 40)
+        )
+        cls.route_kwargs = {
+            'slug': groups[0].slug,
+            'username': authors[0].username,
+            'post_id': cls.post.id,
+        }
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def measure(self, url):
+        cache.clear()
+        with instrumentation.collect() as measurement:
+            response = self.reader_client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 400, url)
+        return measurement
+
+    def test_every_route_has_budget(self):
+        '''Для каждого именованного маршрута объявлен бюджет.'''
+        routes = {name for name, params in named_routes()}
+        self.assertEqual(routes - set(BUDGETS), set())
+        self.assertEqual(set(BUDGETS) - routes, set())
+
+    def test_routes_fit_budget(self):
+        '''Число запросов, время SQL и рендеринга не превышают бюджет.'''
+        for name, params in named_routes():
+            budget = BUDGETS.get(name)
+            if budget is None:
+                continue
+            url = reverse(name, kwargs={
+                param: self.route_kwargs[param] for param in params
+            })
+            measurement = self.measure(url)
+            with self.subTest(route=name, measurement=measurement):
+                self.assertLessEqual(measurement.queries, budget.queries)
+                self.assertLessEqual(
+                    measurement.sql_time * 1000, budget.sql_ms
+                )
+                self.assertLessEqual(
+                    measurement.render_time * 1000, budget.render_ms
+                )
@@ -5,9 +5,14 @@ from django.contrib.auth import get_user_model
 from django.test import Client, TestCase
 from django.urls import reverse
 from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from .. import feed_cache
 from ..models import Group, Post
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
+from django.test import TransactionTestCase
 
 
 User = get_user_model()
@@ -57,6 +62,7 @@ class CacheTest(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        cache.clear()
         # неавторизованный клиент
         self.guest_client = Client()
         # авторизованный клиент
@@ -67,13 +73,80 @@ class CacheTest(TestCase):
         self.author_client.force_login(CacheTest.post.author)
 
     def test_cache(self):
-        '''Тестирование кэша'''
+        '''Повторный запрос главной берёт ленту из кэша'''
+        response = self.guest_client.get(reverse('posts:main'))
+        with CaptureQueriesContext(connection) as queries:
+            response_cached = self.guest_client.get(reverse('posts:main'))
+        self.assertEqual(response.content, response_cached.content)
+        self.assertFalse(any(
+            'FROM "posts_post"' in query['sql']
+            and 'COUNT(' not in query['sql']
+            for query in queries.captured_queries
+        ))
+
+    def test_cursor_page_cache_hit_skips_posts_query(self):
+        '''Закэшированная курсорная страница не выбирает посты'''
+        url = reverse('posts:main') + '?cursor='
+        response = self.guest_client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response_cached = self.guest_client.get(url)
+        self.assertEqual(response.content, response_cached.content)
+        self.assertFalse(any(
+            'FROM "posts_post"' in query['sql']
+            for query in queries.captured_queries
+        ))
+
+    def test_cache_invalidated_on_post_delete(self):
+        '''Удалённый пост сразу пропадает с главной'''
         response = self.authorized_client.get(reverse('posts:main'))
-        responce_one = response.content
+        self.assertContains(response, self.post.text)
         self.post.delete()
 
         response_after_delete = self.authorized_client.get(reverse(
             'posts:main'
         ))
-        responce_two = response_after_delete.content
-        self.assertEqual(responce_one, responce_two)
+        self.assertNotContains(response_after_delete, 'Тестовый текст')
+
+    def test_cache_invalidated_on_post_create(self):
+        '''Новый пост сразу появляется на главной'''
+        self.authorized_client.get(reverse('posts:main'))
+        self.author_client.post(
+            reverse('posts:post_create'), data={'text': 'Свежий пост'}
+        )
+        response = self.authorized_client.get(reverse('posts:main'))
+        self.assertContains(response, 'Свежий пост')
+
+    def test_cache_is_per_page(self):
+        '''Каждая страница главной кэшируется отдельно'''
+        for i in range(10):
+            Post.objects.create(author=self.user, text=f'Пост номер {i}')
+        first_page = self.guest_client.get(reverse('posts:main'))
+        second_page = self.guest_client.get(
+            reverse('posts:main') + '?page=2'
+        )
+        self.assertContains(first_page, 'Пост номер 9')
+        self.assertNotContains(second_page, 'Пост номер 9')
+        self.assertContains(second_page, 'Тестовый текст')
+
+        first_cursor_page = self.guest_client.get(
+            reverse('posts:main') + '?cursor='
+        )
+        next_cursor = first_cursor_page.context['page_obj'].next_cursor
+        second_cursor_page = self.guest_client.get(
+            reverse('posts:main') + f'?cursor={next_cursor}'
+        )
+        self.assertNotContains(second_cursor_page, 'Пост номер 9')
+        self.assertContains(second_cursor_page, 'Тестовый текст')
+
+
+class GenerationOnCommitTest(TransactionTestCase):
+    def test_generation_bumped_again_after_commit(self):
+        '''Поколение лент сбрасывается ещё раз после коммита'''
+        cache.clear()
+        user = User.objects.create_user(username='writer')
+        with transaction.atomic():
+            Post.objects.create(author=user, text='Пост в транзакции')
+            generation_before_commit = feed_cache.get_generation()
+        self.assertGreater(
+            feed_cache.get_generation(), generation_before_commit
+        )
@@ -0,0 +1,93 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import cards
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        for i in range(3):
+            Post.objects.create(
+                author=cls.author, text=f'Пост {i}', group=cls.group
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.url = reverse('posts:url_group', kwargs={'slug': 'test_slug'})
+
+    def rendered(self, url=None):
+        """Сколько карточек отрендерил запрос страницы."""
+        with mock.patch(
+            'posts.cards.render_to_string', wraps=render_to_string
+        ) as render:
+            response = self.guest_client.get(url or self.url)
+        self.assertEqual(response.status_code, 200)
+        return render.call_count
+
+    def test_cards_rendered_once(self):
+        '''Повторный показ ленты берёт все карточки из кэша.'''
+        self.assertEqual(self.rendered(), 3)
+        self.assertEqual(self.rendered(), 0)
+
+    def test_cards_shared_between_feeds(self):
+        '''Карточки из ленты группы переиспользуются на главной.'''
+        self.rendered()
+        self.assertEqual(self.rendered(reverse('posts:main')), 0)
+
+    def test_page_reads_cards_with_one_get_many(self):
+        '''Страница читает карточки одним get_many.'''
+        with mock.patch.object(
+            cache, 'get_many', wraps=cache.get_many
+        ) as get_many:
+            self.guest_client.get(self.url)
+        card_calls = [
+            call for call in get_many.call_args_list
+            if str(call[0][0][0]).startswith('posts:card:')
+        ]
+        self.assertEqual(len(card_calls), 1)
+
+    def test_edit_invalidates_only_its_card(self):
+        '''Правка поста перерисовывает только его карточку.'''
+        self.rendered()
+        post = Post.objects.get(text='Пост 1')
+        post.text = 'Исправленный пост'
+        post.save()
+        self.assertEqual(self.rendered(), 1)
+        self.assertContains(
+            self.guest_client.get(self.url), 'Исправленный пост'
+        )
+
+    def test_author_change_changes_key(self):
+        '''Смена имени автора меняет ключи его карточек.'''
+        post = Post.objects.for_feed().first()
+        key = cards.card_key(post)
+        post.author.first_name = 'Алексей'
+        self.assertNotEqual(cards.card_key(post), key)
+
+    def test_profile_cards_without_author(self):
+        '''В профиле карточки без автора кэшируются отдельно.'''
+        post = Post.objects.for_feed().first()
+        self.assertNotEqual(
+            cards.card_key(post), cards.card_key(post, show_author=False)
+        )
+        html = cards.render_cards([post], show_author=False)[0]
+        self.assertNotIn('Толстой', html)
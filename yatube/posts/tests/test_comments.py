@@ -0,0 +1,94 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Post
+from ..views import COMMENTS_PER_PAGE
+
+User = get_user_model()
+
+
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {i}')
+            for i in range(COMMENTS_PER_PAGE * 2 + 5)
+        )
+        cls.comment_ids = list(
+            cls.post.comments.order_by('created', 'id')
+            .values_list('id', flat=True)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def detail_url(self):
+        return reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+
+    def fragment_url(self):
+        return reverse('posts:post_comments', kwargs={'post_id': self.post.id})
+
+    def test_first_screen_is_one_chunk(self):
+        '''На странице поста только первая порция комментариев.'''
+        response = self.guest_client.get(self.detail_url())
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.id for comment in comments],
+            self.comment_ids[:COMMENTS_PER_PAGE],
+        )
+        self.assertContains(response, 'js-more-comments')
+
+    def test_first_screen_query_count_is_fixed(self):
+        '''Число запросов не растёт вместе с числом комментариев.'''
+        url = self.detail_url()
+        with CaptureQueriesContext(connection) as before:
+            self.guest_client.get(url)
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=User.objects.create_user(
+                username=f'reader{i}'), text='Ещё')
+            for i in range(5)
+        )
+        with CaptureQueriesContext(connection) as after:
+            self.guest_client.get(url)
+        self.assertEqual(len(before), len(after))
+
+    def test_fragment_walks_all_comments(self):
+        '''Фрагмент по курсору отдаёт следующие порции до конца.'''
+        page = self.guest_client.get(self.detail_url()).context['comments']
+        seen = [comment.id for comment in page]
+        while page.has_next():
+            response = self.guest_client.get(
+                self.fragment_url(), {'cursor': page.next_cursor}
+            )
+            self.assertTemplateUsed(response, 'posts/includes/comments.html')
+            page = response.context['comments']
+            seen.extend(comment.id for comment in page)
+        self.assertEqual(seen, self.comment_ids)
+
+    def test_json_chunk(self):
+        '''JSON-ответ содержит комментарии и курсор следующей порции.'''
+        response = self.guest_client.get(
+            self.fragment_url(), {'format': 'json'}
+        )
+        data = response.json()
+        self.assertEqual(
+            [comment['id'] for comment in data['comments']],
+            self.comment_ids[:COMMENTS_PER_PAGE],
+        )
+        self.assertEqual(data['comments'][0]['author'], 'auth')
+        self.assertIsNotNone(data['next_cursor'])
+
+    def test_fragment_for_missing_post(self):
+        '''Для несуществующего поста фрагмент отвечает 404.'''
+        response = self.guest_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 10 ** 6})
+        )
+        self.assertEqual(response.status_code, 404)
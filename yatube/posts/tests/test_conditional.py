@@ -0,0 +1,108 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text='Тестовый пост', group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.urls = (
+            reverse('posts:main'),
+            reverse('posts:url_group', kwargs={'slug': 'test_slug'}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        )
+
+    def revalidate(self, client, url):
+        # первый визит выдаёт CSRF-cookie, от неё зависит ETag
+        client.get(url)
+        etag = client.get(url)['ETag']
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_page_is_not_modified(self):
+        '''Неизменившаяся страница отвечает 304 с пустым телом.'''
+        for client in (self.guest_client, self.reader_client):
+            for url in self.urls:
+                with self.subTest(url=url):
+                    response = self.revalidate(client, url)
+                    self.assertEqual(response.status_code, 304)
+                    self.assertEqual(response.content, b'')
+
+    def test_not_modified_skips_page_queries(self):
+        '''Ответ 304 ленты для гостя не обращается к базе.'''
+        url = reverse('posts:main')
+        etag = self.guest_client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_new_post_changes_etag(self):
+        '''Новый пост меняет ETag всех лент.'''
+        etags = {url: self.guest_client.get(url)['ETag'] for url in self.urls}
+        Post.objects.create(author=self.author, text='Ещё пост')
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_comment_and_follow_change_etag(self):
+        '''Комментарий меняет ETag поста, подписка меняет ETag профиля.'''
+        post_url, profile_url = self.urls[3], self.urls[2]
+        post_etag = self.reader_client.get(post_url)['ETag']
+        profile_etag = self.reader_client.get(profile_url)['ETag']
+
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+
+        response = self.reader_client.get(
+            post_url, HTTP_IF_NONE_MATCH=post_etag
+        )
+        self.assertContains(response, 'Комментарий')
+        response = self.reader_client.get(
+            profile_url, HTTP_IF_NONE_MATCH=profile_etag
+        )
+        self.assertContains(response, 'Отписаться')
+
+    def test_etag_depends_on_user(self):
+        '''Гость и пользователь получают разные ETag.'''
+        url = reverse('posts:main')
+        etag = self.guest_client.get(url)['ETag']
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_last_modified_for_guests_only(self):
+        '''Last-Modified отдаётся гостям и принимается в If-Modified-Since.'''
+        url = reverse('posts:main')
+        last_modified = self.guest_client.get(url)['Last-Modified']
+        response = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(
+            self.reader_client.get(url).has_header('Last-Modified')
+        )
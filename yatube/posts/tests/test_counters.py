@@ -0,0 +1,92 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, UserCounters
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other_slug',
+            description='Другое описание',
+        )
+
+    def counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_post_counters(self):
+        '''Создание, перенос и удаление поста меняют счётчики.'''
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group
+        )
+        self.assertEqual(self.counters(self.author).posts_count, 1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+
+        post.group = self.other_group
+        post.save()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 1)
+
+        post.delete()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.counters(self.author).posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 0)
+
+    def test_comment_and_follow_counters(self):
+        '''Комментарии и подписки меняют счётчики обеих сторон.'''
+        post = Post.objects.create(author=self.author, text='Пост')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий'
+        )
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        reader = self.counters(self.reader)
+        self.assertEqual(reader.comments_count, 1)
+        self.assertEqual(reader.following_count, 1)
+        self.assertEqual(self.counters(self.author).followers_count, 1)
+
+        comment.delete()
+        follow.delete()
+        reader = self.counters(self.reader)
+        self.assertEqual(reader.comments_count, 0)
+        self.assertEqual(reader.following_count, 0)
+        self.assertEqual(self.counters(self.author).followers_count, 0)
+
+    def test_recount_repairs_drift(self):
+        '''Команда recount восстанавливает разошедшиеся счётчики.'''
+        Post.objects.create(author=self.author, text='Пост', group=self.group)
+        UserCounters.objects.filter(user=self.author).update(posts_count=7)
+        Group.objects.filter(id=self.group.id).update(posts_count=7)
+
+        call_command('recount', stdout=StringIO())
+
+        self.group.refresh_from_db()
+        self.assertEqual(self.counters(self.author).posts_count, 1)
+        self.assertEqual(self.group.posts_count, 1)
+
+    def test_profile_does_not_count_posts(self):
+        '''Профиль берёт число постов из счётчика, а не из COUNT(*).'''
+        Post.objects.create(author=self.author, text='Пост')
+        UserCounters.objects.filter(user=self.author).update(posts_count=5)
+        response = Client().get(
+            reverse('posts:profile', kwargs={'username': 'author'})
+        )
+        self.assertEqual(response.context['cnt_posts'], 5)
@@ -0,0 +1,118 @@
+from xml.etree import ElementTree
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post
+
+User = get_user_model()
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+class AtomFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        for i in range(3):
+            Post.objects.create(
+                author=cls.author, text=f'Пост {i}', group=cls.group
+            )
+        Post.objects.create(author=cls.other, text='Чужой пост')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.group_url = reverse(
+            'posts:atom_group', kwargs={'slug': 'test_slug'}
+        )
+        self.other_url = reverse(
+            'posts:atom_profile', kwargs={'username': 'other'}
+        )
+
+    def entries(self, response):
+        root = ElementTree.fromstring(response.content)
+        return [entry.find(f'{ATOM}title').text
+                for entry in root.iter(f'{ATOM}entry')]
+
+    def test_feeds_are_atom(self):
+        '''Ленты отдают Atom с постами своей области.'''
+        cases = {
+            reverse('posts:atom_index'): 4,
+            self.group_url: 3,
+            self.other_url: 1,
+        }
+        for url, count in cases.items():
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertTrue(
+                    response['Content-Type'].startswith('application/atom+xml')
+                )
+                self.assertEqual(len(self.entries(response)), count)
+
+    def test_unknown_group_is_404(self):
+        '''Лента несуществующей группы отвечает 404.'''
+        response = self.guest_client.get(
+            reverse('posts:atom_group', kwargs={'slug': 'missing'})
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_repeat_request_skips_database(self):
+        '''Повторный запрос ленты берётся из кэша без запросов к базе.'''
+        first = self.guest_client.get(self.group_url)
+        with self.assertNumQueries(0):
+            second = self.guest_client.get(self.group_url)
+        self.assertEqual(first.content, second.content)
+
+    def test_unchanged_feed_is_304(self):
+        '''Ленту с прежним ETag не отдают заново.'''
+        etag = self.guest_client.get(self.group_url)['ETag']
+        response = self.guest_client.get(
+            self.group_url, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_new_post_invalidates_only_its_scopes(self):
+        '''Пост в группе сбрасывает ленту группы, но не чужого автора.'''
+        index_url = reverse('posts:atom_index')
+        etags = {
+            url: self.guest_client.get(url)['ETag']
+            for url in (index_url, self.group_url, self.other_url)
+        }
+        Post.objects.create(
+            author=self.author, text='Свежий пост', group=self.group
+        )
+
+        self.assertNotEqual(
+            self.guest_client.get(index_url)['ETag'], etags[index_url]
+        )
+        response = self.guest_client.get(self.group_url)
+        self.assertNotEqual(response['ETag'], etags[self.group_url])
+        self.assertIn('Свежий пост', self.entries(response))
+        self.assertEqual(
+            self.guest_client.get(self.other_url)['ETag'],
+            etags[self.other_url],
+        )
+
+    def test_renamed_group_and_author_feeds_are_404(self):
+        '''После смены slug или имени старая лента не отдаётся из кэша.'''
+        for url in (self.group_url, self.other_url):
+            self.assertEqual(self.guest_client.get(url).status_code, 200)
+        self.group.slug = 'renamed_slug'
+        self.group.save()
+        self.other.username = 'renamed'
+        self.other.save()
+
+        for url in (self.group_url, self.other_url):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 404)
@@ -1,5 +1,12 @@
+import base64
+import json
+from unittest import mock
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from ..models import Group, Post
 
@@ -75,3 +82,85 @@ class PostViewsTest(TestCase):
             'posts:profile',
             kwargs={'username': 'auth'}) + '?page=2')
         self.assertEqual(len(response.context['page_obj']), 2)
+
+    def test_cursor_pages_walk_whole_index(self):
+        """Проверка: курсорные страницы index покрывают все посты без
+        повторов, а ссылка назад возвращает на предыдущую страницу."""
+        response = self.client.get(reverse('posts:main') + '?cursor=')
+        first_page = response.context['page_obj']
+        self.assertTrue(first_page.is_cursor)
+        self.assertEqual(len(first_page), 10)
+        self.assertFalse(first_page.has_previous())
+
+        response = self.client.get(
+            reverse('posts:main') + f'?cursor={first_page.next_cursor}'
+        )
+        second_page = response.context['page_obj']
+        self.assertEqual(len(second_page), 2)
+        self.assertFalse(second_page.has_next())
+        seen = [post.id for post in first_page] + [
+            post.id for post in second_page
+        ]
+        self.assertEqual(seen, list(
+            Post.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True)
+        ))
+
+        response = self.client.get(
+            reverse('posts:main') + f'?cursor={second_page.previous_cursor}'
+        )
+        self.assertEqual(
+            [post.id for post in response.context['page_obj']],
+            [post.id for post in first_page],
+        )
+
+    def test_cursor_pages_do_not_count_rows(self):
+        """Проверка: курсорная страница index не выполняет COUNT(*)."""
+        url = reverse('posts:main')
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            first_page = self.client.get(
+                url + '?cursor='
+            ).context['page_obj']
+            self.client.get(url + f'?cursor={first_page.next_cursor}')
+        self.assertFalse(any(
+            'COUNT(' in query['sql'] for query in queries.captured_queries
+        ))
+
+    def test_broken_cursor_returns_first_page(self):
+        """Проверка: испорченный курсор отдаёт первую страницу group_list."""
+        response = self.client.get(reverse(
+            'posts:url_group',
+            kwargs={'slug': 'Тестовый слаг'}) + '?cursor=garbage!')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page_obj']), 10)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+    def test_cursor_with_bad_values_returns_first_page(self):
+        """Проверка: курсор с неверными значениями отдаёт первую страницу."""
+        cursor = base64.urlsafe_b64encode(
+            json.dumps({'v': ['x', '1']}).encode()
+        ).decode()
+        urls = (
+            reverse('posts:main'),
+            reverse('posts:url_group', kwargs={'slug': 'Тестовый слаг'}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url, {'cursor': cursor})
+                self.assertEqual(response.status_code, 200)
+                page = response.context['page_obj']
+                self.assertEqual(len(page), 10)
+                self.assertFalse(page.has_previous())
+
+    @mock.patch('core.stampede.WAIT_TIMEOUT', 0.05)
+    def test_index_count_of_previous_generation_is_not_used(self):
+        """Проверка: главная не берёт число постов прежнего поколения."""
+        url = reverse('posts:main')
+        self.client.get(url)
+        for i in range(10):
+            Post.objects.create(author=self.user, text=f'Новый пост {i}')
+        # Число пересчитывает «другой запрос» и держит блокировку.
+        cache.add('posts:index_count:lock', 1)
+        response = self.client.get(url)
+        self.assertEqual(response.context['page_obj'].paginator.num_pages, 3)
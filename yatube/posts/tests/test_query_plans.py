@@ -0,0 +1,81 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?\w+$')
+
+
+class QueryPlanTest(TestCase):
+    """Запросы лент идут по индексам, без полного сканирования таблиц."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(3):
+            cls.post = Post.objects.create(
+                author=cls.author, text=f'Пост {i}', group=cls.group
+            )
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text='Комментарий'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def query_plans(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.reader_client.get(url)
+        plans = {}
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or 'posts_' not in sql:
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plans[sql] = [row[-1] for row in cursor.fetchall()]
+        return plans
+
+    def test_feeds_use_indexes(self):
+        '''Ленты не сканируют таблицы целиком и не сортируют во временном
+        B-дереве (лента подписок сортирует не больше TIMELINE_LENGTH строк).'''
+        urls = {
+            reverse('posts:main'): True,
+            reverse('posts:main') + '?cursor=': True,
+            reverse('posts:url_group', kwargs={'slug': 'test_slug'}): True,
+            reverse('posts:profile', kwargs={'username': 'author'}): True,
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}):
+                True,
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id}):
+                True,
+            reverse('posts:follow_index'): False,
+        }
+        for url, strict_order in urls.items():
+            for sql, plan in self.query_plans(url).items():
+                with self.subTest(url=url, sql=sql):
+                    if 'COUNT(*)' not in sql:
+                        self.assertFalse(
+                            any(FULL_SCAN.match(step) for step in plan), plan
+                        )
+                    if strict_order:
+                        self.assertFalse(
+                            any('TEMP B-TREE' in step for step in plan), plan
+                        )
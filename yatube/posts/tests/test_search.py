@@ -0,0 +1,77 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Post
+from ..search import FTS_TABLE, build_match
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.cat_post = Post.objects.create(
+            author=cls.user, text='Кошка спит на окне'
+        )
+        cls.dog_post = Post.objects.create(
+            author=cls.user, text='Собака и кошка гуляют, кошка довольна'
+        )
+        cls.weather_post = Post.objects.create(
+            author=cls.user, text='Про погоду'
+        )
+
+    def search(self, query):
+        response = Client().get(reverse('posts:search'), {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [post.id for post in response.context['page_obj']]
+
+    def test_search_finds_ranked_posts(self):
+        '''Поиск находит посты по словам и ставит лучшие первыми.'''
+        self.assertEqual(
+            self.search('кошка'), [self.dog_post.id, self.cat_post.id]
+        )
+        self.assertEqual(self.search('собака кошка'), [self.dog_post.id])
+        self.assertEqual(self.search('соба'), [self.dog_post.id])
+
+    def test_search_renders_post_cards(self):
+        '''Результаты поиска показываются общими карточками постов.'''
+        response = Client().get(reverse('posts:search'), {'q': 'погоду'})
+        self.assertContains(response, 'Про погоду')
+        self.assertContains(response, reverse(
+            'posts:post_detail', kwargs={'post_id': self.weather_post.id}
+        ))
+
+    def test_search_follows_edits_and_deletes(self):
+        '''Индекс обновляется при изменении и удалении поста.'''
+        self.cat_post.text = 'Теперь здесь про попугая'
+        self.cat_post.save()
+        self.assertEqual(self.search('попугая'), [self.cat_post.id])
+        self.assertEqual(self.search('окне'), [])
+
+        self.dog_post.delete()
+        self.assertEqual(self.search('собака'), [])
+
+    def test_search_ignores_fts_syntax(self):
+        '''Операторы FTS5 в запросе не ломают поиск.'''
+        self.assertEqual(
+            build_match('"кошка" OR (NEAR'), '"кошка" "or" "near"*'
+        )
+        self.assertEqual(self.search('"('), [])
+        self.assertEqual(self.search(''), [])
+
+    def test_rebuild_search_index(self):
+        '''Команда rebuild_search_index восстанавливает индекс.'''
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        self.assertEqual(self.search('погоду'), [])
+
+        call_command('rebuild_search_index', stdout=StringIO())
+
+        self.assertEqual(len(self.search('погоду')), 1)
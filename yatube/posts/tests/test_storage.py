@@ -0,0 +1,150 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from .. import images, thumbnails
+from ..models import Post, StoredImage, ThumbnailJob
+from ..storage import is_content_addressed
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+OTHER_GIF = SMALL_GIF.replace(b'\xFF\xFF\xFF', b'\x00\xFF\x00')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTest(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+
+    def upload(self, user, text, content=SMALL_GIF, name='cat.gif'):
+        client = Client()
+        client.force_login(user)
+        client.post(reverse('posts:post_create'), data={
+            'text': text,
+            'image': SimpleUploadedFile(
+                name=name, content=content, content_type='image/gif'
+            ),
+        })
+        return Post.objects.get(text=text)
+
+    def stored_files(self):
+        return [
+            name
+            for _, _, files in os.walk(os.path.join(TEMP_MEDIA_ROOT, 'posts'))
+            for name in files
+        ]
+
+    def test_duplicate_uploads_share_one_file(self):
+        '''Одинаковые картинки хранятся одним файлом с двумя ссылками.'''
+        first = self.upload(self.author, 'Первый', name='cat.gif')
+        second = self.upload(self.reader, 'Второй', name='CAT.GIF')
+        self.assertTrue(is_content_addressed(first.image.name))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(len(self.stored_files()), 1)
+        self.assertEqual(
+            StoredImage.objects.get(name=first.image.name).references, 2
+        )
+
+    def test_different_content_different_names(self):
+        '''Разное содержимое с одинаковым именем не смешивается.'''
+        first = self.upload(self.author, 'Первый')
+        second = self.upload(self.author, 'Второй', content=OTHER_GIF)
+        self.assertNotEqual(first.image.name, second.image.name)
+
+    def test_duplicate_is_not_thumbnailed_again(self):
+        '''Для повторной загрузки готовые миниатюры не строятся заново.'''
+        self.upload(self.author, 'Первый')
+        for job in thumbnails.claim_jobs(10):
+            self.assertTrue(thumbnails.run_job(job))
+        self.upload(self.reader, 'Второй')
+        self.assertFalse(ThumbnailJob.objects.exists())
+
+    def test_file_removed_with_last_reference(self):
+        '''Файл удаляется вместе с последним ссылающимся постом.'''
+        first = self.upload(self.author, 'Первый')
+        second = self.upload(self.reader, 'Второй')
+        path = first.image.path
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+        second.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(StoredImage.objects.exists())
+
+    def test_replaced_image_is_released(self):
+        '''Замена картинки снимает ссылку со старого файла.'''
+        post = self.upload(self.author, 'Пост')
+        old_path = post.image.path
+        post.image = SimpleUploadedFile(
+            name='dog.gif', content=OTHER_GIF, content_type='image/gif'
+        )
+        post.save()
+        self.assertFalse(os.path.exists(old_path))
+        self.assertEqual(
+            StoredImage.objects.get(name=post.image.name).references, 1
+        )
+
+    def test_foreign_files_are_never_deleted(self):
+        '''Файлы не из хранилища только теряют счётчик.'''
+        post = Post.objects.create(
+            author=self.author, text='Пост', image='posts/legacy.gif'
+        )
+        post.delete()
+        self.assertFalse(StoredImage.objects.exists())
+        self.assertFalse(is_content_addressed('posts/legacy.gif'))
+
+    def test_recount(self):
+        '''recount восстанавливает счётчики по постам.'''
+        post = self.upload(self.author, 'Первый')
+        self.upload(self.reader, 'Второй')
+        StoredImage.objects.all().delete()
+        self.assertEqual(images.recount(), 1)
+        self.assertEqual(
+            StoredImage.objects.get(name=post.image.name).references, 2
+        )
+
+    def test_saved_duplicate_survives_release(self):
+        '''Файл, сохранённый до post_save поста, не удаляется чужим release.'''
+        first = self.upload(self.author, 'Первый')
+        storage = Post._meta.get_field('image').storage
+        name = storage.save('posts/copy.gif', ContentFile(SMALL_GIF))
+        self.assertEqual(name, first.image.name)
+        first.delete()
+        self.assertTrue(storage.exists(name))
+        self.assertEqual(StoredImage.objects.get(name=name).references, 1)
+
+    def test_same_image_uploaded_again(self):
+        '''Повторная загрузка той же картинки в пост не меняет счётчик.'''
+        post = self.upload(self.author, 'Пост')
+        post.image = SimpleUploadedFile(
+            name='again.gif', content=SMALL_GIF, content_type='image/gif'
+        )
+        post.save()
+        self.assertEqual(
+            StoredImage.objects.get(name=post.image.name).references, 1
+        )
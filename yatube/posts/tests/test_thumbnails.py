@@ -0,0 +1,102 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail import get_thumbnail
+
+from .. import thumbnails
+from ..models import Post, ThumbnailJob
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPipelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def create_post(self):
+        self.authorized_client.post(reverse('posts:post_create'), data={
+            'text': 'Пост с картинкой',
+            'image': SimpleUploadedFile(
+                name='small.gif', content=SMALL_GIF, content_type='image/gif'
+            ),
+        })
+        return Post.objects.get(text='Пост с картинкой')
+
+    def test_upload_enqueues_every_geometry(self):
+        '''Загрузка картинки ставит в очередь все размеры миниатюр.'''
+        post = self.create_post()
+        self.assertEqual(
+            set(ThumbnailJob.objects.values_list('geometry', flat=True)),
+            {geometry for geometry, options in thumbnails.GEOMETRIES},
+        )
+        self.assertTrue(all(
+            job.source == post.image.name
+            for job in ThumbnailJob.objects.all()
+        ))
+
+    def test_original_image_until_thumbnail_ready(self):
+        '''Пока миниатюры нет, лента показывает исходную картинку.'''
+        post = self.create_post()
+        response = self.authorized_client.get(reverse('posts:main'))
+        self.assertContains(response, f'src="{post.image.url}"')
+        etag = response['ETag']
+
+        updated = post.updated
+        for job in thumbnails.claim_jobs(10):
+            self.assertTrue(thumbnails.run_job(job))
+        self.assertFalse(ThumbnailJob.objects.exists())
+        post.refresh_from_db()
+        self.assertGreater(post.updated, updated)
+
+        # Без сброса кэша: готовая миниатюра сама меняет поколение лент.
+        response = self.authorized_client.get(
+            reverse('posts:main'), HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, f'src="{post.image.url}"')
+        thumbnail = get_thumbnail(post.image, '480x200', crop='center',
+                                  upscale=False)
+        self.assertContains(response, f'src="{thumbnail.url}"')
+
+    @override_settings(THUMBNAIL_MAX_ATTEMPTS=2)
+    def test_broken_image_is_not_retried_forever(self):
+        '''Задача с битой картинкой перестаёт выдаваться после попыток.'''
+        thumbnails.enqueue(
+            thumbnails.ImageFile('posts/missing.gif'), '480x200', {}
+        )
+        for attempt in range(2):
+            jobs = thumbnails.claim_jobs(10)
+            self.assertEqual(len(jobs), 1)
+            with self.assertLogs('sorl.thumbnail.base', level='ERROR'):
+                self.assertFalse(thumbnails.run_job(jobs[0]))
+        self.assertEqual(thumbnails.claim_jobs(10), [])
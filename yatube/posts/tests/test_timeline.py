@@ -0,0 +1,132 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import timeline
+from ..models import Follow, Post, TimelineEntry, UserCounters
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def feed_ids(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return [post.id for post in response.context['page_obj']]
+
+    def test_new_post_fans_out_to_followers(self):
+        '''Новый пост автора попадает в ленту подписчика.'''
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        Post.objects.create(author=self.other, text='Чужой пост')
+
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(self.feed_ids(), [post.id])
+
+    def test_follow_and_unfollow_update_timeline(self):
+        '''Подписка дописывает старые посты автора, отписка их убирает.'''
+        old_post = Post.objects.create(author=self.author, text='Старый пост')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.feed_ids(), [old_post.id])
+
+        follow.delete()
+        self.assertEqual(self.feed_ids(), [])
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader).exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_author_is_merged_on_read(self):
+        '''Посты авторов с большим числом подписчиков читаются напрямую.'''
+        Follow.objects.create(user=self.reader, author=self.author)
+        cache.clear()
+        post = Post.objects.create(author=self.author, text='Популярный')
+
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        self.assertEqual(self.feed_ids(), [post.id])
+
+    @override_settings(TIMELINE_LENGTH=2)
+    def test_build_timelines_rebuilds_and_bounds_timeline(self):
+        '''Команда build_timelines восстанавливает ограниченную ленту.'''
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            for i in range(3)
+        ]
+        TimelineEntry.objects.all().delete()
+
+        call_command('build_timelines', stdout=StringIO())
+
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(
+                user=self.reader).values_list('post_id', flat=True)),
+            [posts[2].id, posts[1].id],
+        )
+
+    @override_settings(TIMELINE_LENGTH=2)
+    def test_fan_out_keeps_timeline_bounded(self):
+        '''Раскладка новых постов не растит ленту сверх TIMELINE_LENGTH.'''
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            for i in range(4)
+        ]
+
+        for user in (self.reader, self.other):
+            with self.subTest(user=user.username):
+                self.assertEqual(
+                    list(TimelineEntry.objects.filter(
+                        user=user).values_list('post_id', flat=True)),
+                    [posts[3].id, posts[2].id],
+                )
+
+    def test_author_back_to_fan_out_keeps_pulled_posts(self):
+        '''Посты автора, вернувшегося к раскладке, остаются в ленте.'''
+        Follow.objects.create(user=self.reader, author=self.author)
+        with self.settings(TIMELINE_FANOUT_LIMIT=0):
+            post = Post.objects.create(author=self.author, text='Популярный')
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+
+        cache.clear()
+        fresh = Post.objects.create(author=self.author, text='Свежий')
+        self.assertEqual(self.feed_ids(), [fresh.id, post.id])
+        # Чтение ленты посты не раскладывает: это работа build_timelines.
+        self.assertFalse(TimelineEntry.objects.exists())
+
+        call_command(
+            'build_timelines', push_back_only=True, stdout=StringIO()
+        )
+        self.assertFalse(UserCounters.objects.filter(pulled=True).exists())
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(
+                user=self.reader).values_list('post_id', flat=True)),
+            {fresh.id, post.id},
+        )
+        newest = Post.objects.create(author=self.author, text='Новейший')
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=newest).exists())
+
+    def test_pull_mode_survives_cache_loss(self):
+        '''Автор остаётся в режиме подмешивания, даже если кеш очищен.'''
+        Follow.objects.create(user=self.reader, author=self.author)
+        with self.settings(TIMELINE_FANOUT_LIMIT=0):
+            post = Post.objects.create(author=self.author, text='Популярный')
+        cache.clear()
+        self.assertIn(self.author.id, timeline.pull_authors())
+        self.assertEqual(self.feed_ids(), [post.id])
@@ -0,0 +1,248 @@
+import base64
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import search, transfer
+from ..models import (Comment, Follow, Group, Post, ThumbnailJob,
+                      TimelineEntry, UserCounters)
+
+User = get_user_model()
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEMP_MEDIA_ROOT = os.path.join(TEMP_DIR, 'media')
+OLD_DATE = datetime(2020, 5, 17, 10, 30, tzinfo=timezone.utc)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class TransferTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.path = os.path.join(TEMP_DIR, 'dump.ndjson')
+
+    def seed(self):
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='Тестовая группа', slug='test_slug', description='Описание'
+        )
+        for i in range(5):
+            post = Post.objects.create(
+                author=author, text=f'Кошка {i}', group=group
+            )
+            Comment.objects.create(post=post, author=reader, text='Ок')
+        Post.objects.filter(text='Кошка 0').update(pub_date=OLD_DATE)
+        Follow.objects.create(user=reader, author=author)
+
+    def test_export_import_round_trip(self):
+        '''Выгрузка и загрузка NDJSON сохраняют данные и производные.'''
+        self.seed()
+        call_command('export_posts', output=self.path, stderr=StringIO())
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+        Group.objects.all().delete()
+        User.objects.filter(username='author').delete()
+
+        out = StringIO()
+        call_command(
+            'import_posts', self.path, batch_size=2,
+            stdout=out, stderr=StringIO(),
+        )
+
+        self.assertIn('Загружено постов: 5', out.getvalue())
+        author = User.objects.get(username='author')
+        reader = User.objects.get(username='reader')
+        self.assertEqual(Post.objects.filter(
+            author=author, group__slug='test_slug').count(), 5)
+        self.assertEqual(
+            Post.objects.get(text='Кошка 0').pub_date, OLD_DATE
+        )
+        self.assertEqual(Comment.objects.filter(author=reader).count(), 5)
+        self.assertTrue(Follow.objects.filter(
+            user=reader, author=author).exists())
+        self.assertEqual(
+            UserCounters.objects.get(user=author).posts_count, 5
+        )
+        self.assertEqual(Group.objects.get().posts_count, 5)
+        self.assertEqual(TimelineEntry.objects.filter(user=reader).count(), 5)
+        found = search.search_posts(Post.objects.all(), 'кошка')
+        self.assertEqual(found.count(), 5)
+
+    def test_csv_import_creates_missing_authors_and_groups(self):
+        '''CSV-загрузка создаёт недостающих авторов и группы.'''
+        path = os.path.join(TEMP_DIR, 'posts.csv')
+        with open(path, 'w', encoding='utf-8', newline='') as stream:
+            stream.write('id,author,group,text,pub_date,image\n')
+            stream.write('7,newcomer,cats,Привет,2021-01-02T03:04:05,\n')
+            stream.write('8,newcomer,,Без группы,,\n')
+        call_command('import_posts', path, stdout=StringIO(),
+                     stderr=StringIO())
+
+        post = Post.objects.get(text='Привет')
+        self.assertEqual(post.author.username, 'newcomer')
+        self.assertEqual(post.group.slug, 'cats')
+        self.assertEqual(post.pub_date.year, 2021)
+        self.assertIsNone(Post.objects.get(text='Без группы').group)
+
+    def test_csv_comments_use_post_ids_of_earlier_import(self):
+        '''Комментарии из CSV находят посты прошлой загрузки по --post-ids.'''
+        self.seed()
+        paths = {
+            kind: os.path.join(TEMP_DIR, f'{kind}s.csv')
+            for kind in ('post', 'comment')
+        }
+        for kind, path in paths.items():
+            call_command('export_posts', output=path, format='csv',
+                         kinds=[kind], stderr=StringIO())
+        Post.objects.all().delete()
+        post_ids = os.path.join(TEMP_DIR, 'post_ids.json')
+        if os.path.exists(post_ids):
+            os.remove(post_ids)
+
+        with self.assertRaises(CommandError):
+            call_command('import_posts', paths['comment'], type='comment',
+                         stdout=StringIO(), stderr=StringIO())
+        for kind, path in paths.items():
+            call_command('import_posts', path, type=kind, post_ids=post_ids,
+                         stdout=StringIO(), stderr=StringIO())
+
+        self.assertEqual(Comment.objects.count(), 5)
+        for post in Post.objects.all():
+            self.assertEqual(post.comments.count(), 1)
+
+    def test_records_with_bad_dates_are_skipped(self):
+        '''Записи с неразборчивой датой пропускаются и считаются.'''
+        with open(self.path, 'w', encoding='utf-8') as stream:
+            for record in (
+                {'type': 'post', 'id': 1, 'author': 'author',
+                 'text': 'Битая дата', 'pub_date': '2021-02-30T10:00:00'},
+                {'type': 'post', 'id': 2, 'author': 'author',
+                 'text': 'Не дата', 'pub_date': 'вчера'},
+                {'type': 'post', 'id': 3, 'author': 'author',
+                 'text': 'Целый', 'pub_date': '2021-01-02T03:04:05'},
+                {'type': 'comment', 'post': 1, 'author': 'reader',
+                 'text': 'К пропущенному'},
+                {'type': 'comment', 'post': 3, 'author': 'reader',
+                 'text': 'Без даты', 'created': 'никогда'},
+            ):
+                stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+        out = StringIO()
+        call_command('import_posts', self.path, stdout=out, stderr=StringIO())
+
+        self.assertEqual(
+            list(Post.objects.values_list('text', flat=True)), ['Целый']
+        )
+        self.assertFalse(Comment.objects.exists())
+        self.assertIn('Пропущено: post: 2, comment: 2', out.getvalue())
+
+    def test_images_are_copied_and_queued(self):
+        '''Картинки копируются из --media-dir и встают в очередь миниатюр.'''
+        media_dir = os.path.join(TEMP_DIR, 'source')
+        os.makedirs(os.path.join(media_dir, 'posts'), exist_ok=True)
+        with open(os.path.join(media_dir, 'posts', 'cat.gif'), 'wb') as file:
+            file.write(b'GIF89a')
+        with open(self.path, 'w', encoding='utf-8') as stream:
+            stream.write(
+                '{"type": "post", "id": 1, "author": "author", '
+                '"text": "С картинкой", "image": "posts/cat.gif"}\n'
+            )
+        call_command('import_posts', self.path, media_dir=media_dir,
+                     stdout=StringIO(), stderr=StringIO())
+
+        post = Post.objects.get()
+        self.assertTrue(post.image.storage.exists(post.image.name))
+        self.assertTrue(ThumbnailJob.objects.filter(
+            source=post.image.name).exists())
+
+    def test_export_csv_of_one_kind(self):
+        '''CSV выгружает записи одного вида.'''
+        self.seed()
+        stream = StringIO()
+        self.assertEqual(transfer.write_csv(stream, 'follow'), 1)
+        self.assertEqual(stream.getvalue().splitlines()[1], 'reader,author')
+
+
+class ProfileExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=f'Пост {i}')
+            for i in range(7)
+        ]
+        cls.posts.reverse()
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.author)
+        self.url = reverse(
+            'posts:profile_export', kwargs={'username': 'author'}
+        )
+
+    def read(self, response):
+        content = b''.join(response.streaming_content).decode()
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_export_requires_login(self):
+        '''Гость перенаправляется на страницу входа.'''
+        response = Client().get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_streams_all_posts_newest_first(self):
+        '''Выгрузка содержит все посты автора, новые первыми.'''
+        response = self.authorized_client.get(self.url)
+        self.assertEqual(
+            response['Content-Type'], 'application/x-ndjson; charset=utf-8'
+        )
+        records = self.read(response)
+        self.assertEqual(
+            [record['id'] for record in records],
+            [post.id for post in self.posts],
+        )
+
+    def test_chunks_cost_fixed_queries(self):
+        '''Каждая порция выгрузки стоит одного запроса.'''
+        with self.assertNumQueries(4):
+            lines = list(transfer.stream_author_posts(
+                self.author, chunk_size=2
+            ))
+        self.assertEqual(len(lines), 7)
+
+    def test_resume_from_cursor(self):
+        '''Выгрузку можно продолжить с курсора любой строки.'''
+        records = self.read(self.authorized_client.get(self.url))
+        response = self.authorized_client.get(
+            self.url, {'cursor': records[2]['cursor']}
+        )
+        self.assertEqual(
+            [record['id'] for record in self.read(response)],
+            [post.id for post in self.posts[3:]],
+        )
+
+    def test_invalid_cursor(self):
+        '''Битый курсор даёт 400, а не выгрузку с начала.'''
+        bad_values = base64.urlsafe_b64encode(
+            json.dumps({'v': ['x', '1']}).encode()
+        ).decode()
+        for cursor in ('xyz', bad_values):
+            with self.subTest(cursor=cursor):
+                response = self.authorized_client.get(
+                    self.url, {'cursor': cursor}
+                )
+                self.assertEqual(response.status_code, 400)
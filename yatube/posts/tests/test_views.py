@@ -5,7 +5,8 @@ from django.contrib.auth import get_user_model
 from django.test import Client, TestCase
 from django.urls import reverse
 from django.conf import settings
-from ..models import Group, Post
+from django.core.cache import cache
+from ..models import Comment, Follow, Group, Post
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 
@@ -245,3 +246,50 @@ class PostViewsTest(TestCase):
         )
         )
         self.assertEqual(len(response.context['page_obj']), 0)
+
+
+class QueryBudgetTest(TestCase):
+    """Ленты выполняют фиксированное число запросов на страницу."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(15):
+            cls.post = Post.objects.create(
+                author=cls.author,
+                text=f'Тестовый текст {i}',
+                group=cls.group,
+            )
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text='Комментарий'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_feed_query_budget(self):
+        '''Число запросов страницы не зависит от числа постов на ней.'''
+        # сессия и пользователь дают ещё два запроса авторизованному клиенту,
+        # страница поста считает комментарии для ETag
+        budgets = {
+            reverse('posts:main'): 2,
+            reverse('posts:url_group', kwargs={'slug': 'test_slug'}): 3,
+            reverse('posts:profile', kwargs={'username': 'author'}): 4,
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}): 3,
+            reverse('posts:follow_index'): 3,
+        }
+        for url, budget in budgets.items():
+            with self.subTest(url=url):
+                cache.clear()
+                with self.assertNumQueries(budget + 2):
+                    self.reader_client.get(url)
@@ -0,0 +1,151 @@
+"""Фоновая подготовка миниатюр картинок постов.
+
+sorl-thumbnail по умолчанию декодирует картинку прямо в запросе, когда
+миниатюру впервые просят в шаблоне. ``PregeneratingBackend`` вместо этого
+ставит задачу в очередь ``ThumbnailJob`` и, пока миниатюра не готова,
+отдаёт шаблону исходную картинку. Загрузка картинки через
+``post_create``/``post_edit`` сразу ставит в очередь все размеры из
+``GEOMETRIES``. Очередь разбирает команда ``thumbnail_worker``.
+"""
+import json
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Q
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.helpers import serialize, tokey
+from sorl.thumbnail.images import ImageFile
+
+from core import metrics
+
+from . import feed_cache
+from .models import Post, ThumbnailJob
+
+logger = logging.getLogger(__name__)
+
+# Размеры и параметры миниатюр, которые используют шаблоны постов.
+GEOMETRIES = (
+    ('480x200', {'crop': 'center', 'upscale': False}),
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+QUEUED_KEY = 'posts:thumbnails:queued:{}'
+
+
+class PregeneratingBackend(ThumbnailBackend):
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not settings.THUMBNAIL_ASYNC:
+            return self.render(file_, geometry_string, **options)
+        source = ImageFile(file_)
+        cached = default.kvstore.get(
+            self.thumbnail_file(source, geometry_string, options)
+        )
+        if cached:
+            return cached
+        enqueue(source, geometry_string, options)
+        return source
+
+    def render(self, file_, geometry_string, **options):
+        """Синхронно генерирует миниатюру, как это делает sorl."""
+        return super().get_thumbnail(file_, geometry_string, **options)
+
+    def thumbnail_file(self, source, geometry_string, options):
+        """Файл миниатюры; имя считается так же, как в ``get_thumbnail``."""
+        options = dict(options)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+
+def pregenerate(image):
+    """Ставит в очередь все миниатюры, которые понадобятся шаблонам."""
+    if not image or not settings.THUMBNAIL_ASYNC:
+        return
+    for geometry_string, options in GEOMETRIES:
+        default.backend.get_thumbnail(image, geometry_string, **options)
+
+
+def enqueue(source, geometry_string, options):
+    key = tokey(source.key, geometry_string, serialize(options))
+    # Повторные промахи по той же миниатюре не пишут в базу.
+    if not cache.add(
+        QUEUED_KEY.format(key), True, settings.THUMBNAIL_QUEUED_TIMEOUT
+    ):
+        return
+    ThumbnailJob.objects.bulk_create([ThumbnailJob(
+        key=key,
+        source=source.name,
+        geometry=geometry_string,
+        options=json.dumps(options),
+    )], ignore_conflicts=True)
+
+
+def claim_jobs(limit):
+    """Забирает свободные задачи; зависшие дольше таймаута выдаются снова."""
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.THUMBNAIL_CLAIM_TIMEOUT)
+    candidates = ThumbnailJob.objects.filter(
+        Q(claimed__isnull=True) | Q(claimed__lt=stale),
+        attempts__lt=settings.THUMBNAIL_MAX_ATTEMPTS,
+    ).values_list('id', 'claimed')[:limit]
+    claimed = [
+        job_id for job_id, claimed_at in candidates
+        if ThumbnailJob.objects.filter(id=job_id, claimed=claimed_at).update(
+            claimed=now, attempts=F('attempts') + 1
+        )
+    ]
+    return list(ThumbnailJob.objects.filter(id__in=claimed))
+
+
+def run_job(job):
+    """Генерирует миниатюру задачи; при успехе задача удаляется."""
+    backend = default.backend
+    source = ImageFile(job.source, Post._meta.get_field('image').storage)
+    options = json.loads(job.options)
+    start = time.perf_counter()
+    try:
+        backend.render(source, job.geometry, **options)
+        ready = default.kvstore.get(
+            backend.thumbnail_file(source, job.geometry, options)
+        ) is not None
+    except Exception:
+        logger.exception('Миниатюра %s для %s не создана',
+                         job.geometry, job.source)
+        ready = False
+    metrics.observe(
+        'yatube_thumbnail_generation_seconds', time.perf_counter() - start,
+        geometry=job.geometry, outcome='ok' if ready else 'error',
+    )
+    if ready:
+        job.delete()
+        refresh_posts(job.source)
+    else:
+        ThumbnailJob.objects.filter(id=job.id).update(claimed=None)
+    return ready
+
+
+def refresh_posts(source):
+    """Перерисовывает посты с картинкой ``source`` уже с миниатюрой.
+
+    ``update()`` не шлёт сигналов, поэтому поколения лент, по которым
+    живут фрагменты и ETag, сбрасываются здесь же.
+    """
+    posts = Post.objects.filter(image=source)
+    posts.update(updated=timezone.now())
+    scopes = set()
+    for post in posts.select_related('author', 'group'):
+        scopes.update(feed_cache.post_scopes(post))
+    feed_cache.invalidate(*scopes)
@@ -0,0 +1,179 @@
+"""Предрассчитанные ленты подписок (fan-out on write).
+
+Новый пост автора сразу раскладывается в ленты его подписчиков, и
+``follow_index`` читает страницу из готовой ленты вместо подзапроса по
+``Follow``. Авторы с очень большим числом подписчиков в ленты не
+раскладываются: их посты подмешиваются при чтении (fan-out on read).
+Каждая лента ограничена ``TIMELINE_LENGTH`` записями.
+
+Такие авторы отмечены флагом ``UserCounters.pulled``: его ставит первый
+пост после того, как подписчиков стало больше порога. Автор, у которого
+подписчиков снова не больше порога, остаётся отмеченным, пока
+``build_timelines`` не разложит его посты по лентам: до этого они
+по-прежнему подмешиваются при чтении и из лент не пропадают.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import OuterRef, Q, Subquery
+from django.utils import timezone
+
+from .models import Follow, Post, TimelineEntry, UserCounters
+
+PULL_AUTHORS_KEY = 'posts:timeline:pull_authors'
+BATCH_SIZE = 500
+
+
+def pull_authors():
+    """Авторы, чьи посты подмешиваются в ленту при чтении."""
+    authors = cache.get(PULL_AUTHORS_KEY)
+    if authors is None:
+        authors = frozenset(UserCounters.objects.filter(
+            pulled=True
+        ).values_list('user_id', flat=True))
+        cache.set(
+            PULL_AUTHORS_KEY, authors, settings.TIMELINE_PULL_CACHE_TIMEOUT
+        )
+    return authors
+
+
+def is_pulled(author_id):
+    """То же для одного автора, но по базе, а не по кешу процесса.
+
+    Запись решает, раскладывать ли пост, поэтому устаревший кеш здесь
+    потерял бы пост в лентах.
+    """
+    counters = UserCounters.objects.filter(user_id=author_id)
+    row = counters.values_list('pulled', 'followers_count').first()
+    if row is None:
+        return False
+    pulled, followers = row
+    if not pulled and followers > settings.TIMELINE_FANOUT_LIMIT:
+        counters.update(pulled=True)
+        cache.delete(PULL_AUTHORS_KEY)
+        return True
+    return pulled
+
+
+def push_back_authors():
+    """Раскладывает посты авторов, вернувшихся к fan-out on write.
+
+    Пока посты автора подмешивались при чтении, в ленты они не попадали.
+    Флаг снимается после раскладки, а посты, вышедшие за это время,
+    раскладываются вторым проходом. Возвращает число авторов.
+    """
+    returned = UserCounters.objects.filter(
+        pulled=True, followers_count__lte=settings.TIMELINE_FANOUT_LIMIT
+    ).values_list('user_id', flat=True)
+    pushed = 0
+    for author_id in list(returned):
+        started = timezone.now()
+        posts = Post.objects.filter(author_id=author_id)
+        _push_author(author_id, posts)
+        UserCounters.objects.filter(user_id=author_id).update(pulled=False)
+        cache.delete(PULL_AUTHORS_KEY)
+        _push_author(author_id, posts.filter(pub_date__gte=started))
+        pushed += 1
+    return pushed
+
+
+def fan_out(post):
+    """Кладёт новый пост в ленты всех подписчиков автора."""
+    if is_pulled(post.author_id):
+        return
+    for followers in _follower_batches(post.author_id):
+        TimelineEntry.objects.bulk_create(
+            [
+                TimelineEntry(
+                    user_id=user_id, post=post, pub_date=post.pub_date
+                )
+                for user_id in followers
+            ],
+            ignore_conflicts=True,
+        )
+        trim_many(followers)
+
+
+def add_author(user_id, author_id):
+    """Дописывает в ленту свежие посты автора, на которого подписались."""
+    if is_pulled(author_id):
+        return
+    _copy_posts(user_id, Post.objects.filter(author_id=author_id))
+    trim(user_id)
+
+
+def remove_author(user_id, author_id):
+    """Убирает из ленты посты автора, от которого отписались."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def rebuild(user_id):
+    """Собирает ленту пользователя заново по его подпискам."""
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    authors = Follow.objects.filter(user_id=user_id).exclude(
+        author_id__in=pull_authors()
+    ).values('author_id')
+    _copy_posts(user_id, Post.objects.filter(author_id__in=authors))
+
+
+def trim(user_id):
+    """Обрезает ленту до последних ``TIMELINE_LENGTH`` записей."""
+    trim_many([user_id])
+
+
+def trim_many(user_ids):
+    """Обрезает ленты пользователей одним запросом."""
+    length = settings.TIMELINE_LENGTH
+    # У лент короче TIMELINE_LENGTH подзапрос пуст, и они не меняются.
+    oldest_kept = TimelineEntry.objects.filter(
+        user_id=OuterRef('user_id')
+    ).order_by('-pub_date').values('pub_date')[length - 1:length]
+    TimelineEntry.objects.filter(
+        user_id__in=user_ids, pub_date__lt=Subquery(oldest_kept)
+    ).delete()
+
+
+def get_posts(user):
+    """Посты ленты подписок: готовая лента плюс посты «тяжёлых» авторов."""
+    in_timeline = Q(id__in=TimelineEntry.objects.filter(
+        user=user
+    ).values('post_id')[:settings.TIMELINE_LENGTH])
+    pulled = pull_authors()
+    if pulled:
+        in_timeline |= Q(author_id__in=Follow.objects.filter(
+            user=user, author_id__in=pulled
+        ).values('author_id'))
+    return Post.objects.filter(in_timeline)
+
+
+def _copy_posts(user_id, posts):
+    posts = posts.order_by('-pub_date').values_list('id', 'pub_date')
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in posts[:settings.TIMELINE_LENGTH]
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def _follower_batches(author_id):
+    """Подписчики автора пачками по ``BATCH_SIZE``."""
+    last_id = 0
+    while True:
+        batch = list(Follow.objects.filter(
+            author_id=author_id, user_id__gt=last_id
+        ).order_by('user_id').values_list('user_id', flat=True)[:BATCH_SIZE])
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1]
+
+
+def _push_author(author_id, posts):
+    for followers in _follower_batches(author_id):
+        for user_id in followers:
+            _copy_posts(user_id, posts)
+        trim_many(followers)
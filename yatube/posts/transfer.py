@@ -0,0 +1,345 @@
+"""Массовый перенос постов, комментариев и подписок в NDJSON и CSV.
+
+Экспорт читает базу итератором и пишет построчно, импорт копит не больше
+одной пачки каждого вида. Обе стороны работают в постоянной памяти; на
+импорте растут только словари «имя -> id» авторов, групп и постов.
+
+Записи NDJSON различаются полем ``type``: ``post``, ``comment``,
+``follow``. В CSV лежат записи одного вида. Посты ссылаются на автора по
+``username`` и на группу по ``slug``, комментарии на пост по его ``id`` из
+выгрузки, поэтому посты должны идти в файле раньше своих комментариев.
+Загруженные посты получают новые id; соответствие «id выгрузки -> id в
+базе» можно передать следующему запуску через ``post_ids``, чтобы
+загрузить комментарии из отдельного файла.
+"""
+import csv
+import json
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.core.files import File
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core import locks
+
+from . import counters, feed_cache, images, search, thumbnails, timeline
+from .models import Comment, Follow, Group, Post, User
+from .paginators import CursorPaginator
+
+KINDS = ('post', 'comment', 'follow')
+FIELDS = {
+    'post': ('id', 'author', 'group', 'text', 'pub_date', 'image'),
+    'comment': ('post', 'author', 'text', 'created'),
+    'follow': ('user', 'author'),
+}
+
+
+def export_records(kind):
+    """Записи одного вида в порядке первичного ключа."""
+    if kind == 'post':
+        rows = Post.objects.order_by('id').values_list(
+            'id', 'author__username', 'group__slug', 'text', 'pub_date',
+            'image',
+        )
+    elif kind == 'comment':
+        rows = Comment.objects.order_by('id').values_list(
+            'post_id', 'author__username', 'text', 'created',
+        )
+    else:
+        rows = Follow.objects.order_by('id').values_list(
+            'user__username', 'author__username',
+        )
+    for row in rows.iterator(chunk_size=2000):
+        record = dict(zip(FIELDS[kind], row))
+        for name in ('pub_date', 'created'):
+            if name in record:
+                record[name] = record[name].isoformat()
+        yield record
+
+
+def stream_author_posts(author, cursor=None, chunk_size=500):
+    """Строки NDJSON с постами автора от новых к старым.
+
+    Посты читаются порциями по курсору ``(pub_date, id)``, поэтому память
+    не растёт с числом постов и ни одна выборка не держит базу долго.
+    В каждой строке есть ``cursor``, с которого выгрузку можно продолжить.
+    """
+    paginator = CursorPaginator(
+        Post.objects.filter(author=author).select_related('author', 'group'),
+        chunk_size,
+    )
+    while True:
+        page = paginator.get_page(cursor)
+        for post in page:
+            record = {
+                'id': post.id,
+                'author': post.author.username,
+                'group': post.group.slug if post.group else None,
+                'text': post.text,
+                'pub_date': post.pub_date.isoformat(),
+                'image': post.image.name or '',
+                'cursor': paginator.encode_cursor(post),
+            }
+            yield json.dumps(record, ensure_ascii=False) + '\n'
+        if not page.has_next():
+            return
+        cursor = page.next_cursor
+
+
+def write_ndjson(stream, kinds=KINDS):
+    written = 0
+    for kind in kinds:
+        for record in export_records(kind):
+            stream.write(json.dumps(dict(record, type=kind),
+                                    ensure_ascii=False))
+            stream.write('\n')
+            written += 1
+    return written
+
+
+def write_csv(stream, kind):
+    writer = csv.DictWriter(stream, FIELDS[kind])
+    writer.writeheader()
+    written = 0
+    for record in export_records(kind):
+        writer.writerow(record)
+        written += 1
+    return written
+
+
+def read_ndjson(stream):
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_csv(stream, kind):
+    for record in csv.DictReader(stream):
+        record['type'] = kind
+        yield record
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Отключает ``auto_now_add``, чтобы сохранить даты из выгрузки."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Importer:
+    """Пачками складывает записи в базу через ``bulk_create``.
+
+    После ``finish()`` пересчитывает всё, что при ``bulk_create`` не
+    обновили сигналы: счётчики, ленты подписок, поисковый индекс, ссылки
+    на картинки, очередь миниатюр и поколение кэша лент. Записи с
+    неразборчивой датой пропускаются и считаются в ``skipped``.
+    """
+
+    def __init__(self, batch_size=1000, media_dir=None, progress=None,
+                 post_ids=None):
+        self.batch_size = batch_size
+        self.media_dir = media_dir
+        self.progress = progress
+        self.users = dict(User.objects.values_list('username', 'id'))
+        self.groups = dict(Group.objects.values_list('slug', 'id'))
+        self.post_ids = dict(post_ids or {})
+        self.pending = {kind: [] for kind in KINDS}
+        self.pending_posts = set()
+        self.feed_scopes = set()
+        self.imported = Counter()
+        self.skipped = Counter()
+        self.first_post_id = None
+        self.started = time.monotonic()
+
+    def add(self, record):
+        kind = record.get('type')
+        if kind not in self.pending:
+            self.skipped[kind] += 1
+            return
+        if kind == 'comment' and str(record['post']) in self.pending_posts:
+            self.flush('post')
+        if kind == 'post':
+            self.pending_posts.add(str(record['id']))
+        self.pending[kind].append(record)
+        if len(self.pending[kind]) >= self.batch_size:
+            self.flush(kind)
+
+    def flush(self, kind):
+        records, self.pending[kind] = self.pending[kind], []
+        if kind == 'post':
+            self.pending_posts.clear()
+        if not records:
+            return
+        with transaction.atomic():
+            getattr(self, f'_flush_{kind}s')(records)
+        if self.progress:
+            elapsed = time.monotonic() - self.started
+            total = sum(self.imported.values())
+            self.progress(kind, self.imported[kind], total / elapsed)
+
+    def finish(self):
+        for kind in KINDS:
+            self.flush(kind)
+        if any(self.imported.values()):
+            counters.recount_users()
+            counters.recount_groups()
+        if self.imported['post'] or self.imported['follow']:
+            followers = Follow.objects.values_list('user_id', flat=True)
+            for user_id in followers.distinct().iterator():
+                timeline.rebuild(user_id)
+        if self.imported['post']:
+            search.rebuild()
+            images.recount()
+            with_images = Post.objects.filter(
+                id__gte=self.first_post_id
+            ).exclude(image='').only('image')
+            for post in with_images.iterator():
+                thumbnails.pregenerate(post.image)
+            feed_cache.invalidate(*self.feed_scopes)
+        return self.imported
+
+    def _flush_posts(self, records):
+        authors = self._resolve_users(record['author'] for record in records)
+        groups = self._resolve_groups(
+            record['group'] for record in records if record.get('group')
+        )
+        # Иначе пост, созданный на сайте между чтением Max('id') и
+        # вставкой, занял бы id из пачки.
+        locks.lock_table(Post)
+        next_id = (Post.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        if self.first_post_id is None:
+            self.first_post_id = next_id
+        posts = []
+        for record in records:
+            pub_date = self._date(record.get('pub_date'))
+            if pub_date is None:
+                self.skipped['post'] += 1
+                continue
+            post_id = next_id + len(posts)
+            posts.append(Post(
+                id=post_id,
+                author_id=authors[record['author']],
+                group_id=groups.get(record.get('group')),
+                text=record['text'],
+                pub_date=pub_date,
+                image=self._image(record.get('image')),
+            ))
+            self.post_ids[str(record['id'])] = post_id
+            self.feed_scopes.add(f'author:{record["author"]}')
+            if record.get('group'):
+                self.feed_scopes.add(f'group:{record["group"]}')
+        with explicit_dates(Post._meta.get_field('pub_date')):
+            Post.objects.bulk_create(posts, batch_size=self.batch_size)
+        self._reset_sequences()
+        self.imported['post'] += len(posts)
+
+    def _flush_comments(self, records):
+        authors = self._resolve_users(record['author'] for record in records)
+        comments = []
+        for record in records:
+            post_id = self.post_ids.get(str(record['post']))
+            created = self._date(record.get('created'))
+            if post_id is None or created is None:
+                self.skipped['comment'] += 1
+                continue
+            comments.append(Comment(
+                post_id=post_id,
+                author_id=authors[record['author']],
+                text=record['text'],
+                created=created,
+            ))
+        with explicit_dates(Comment._meta.get_field('created')):
+            Comment.objects.bulk_create(comments, batch_size=self.batch_size)
+        self.imported['comment'] += len(comments)
+
+    def _flush_follows(self, records):
+        users = self._resolve_users(
+            name for record in records
+            for name in (record['user'], record['author'])
+        )
+        follows = [
+            Follow(user_id=users[record['user']],
+                   author_id=users[record['author']])
+            for record in records if record['user'] != record['author']
+        ]
+        if len(follows) < len(records):
+            self.skipped['follow'] += len(records) - len(follows)
+        Follow.objects.bulk_create(
+            follows, batch_size=self.batch_size, ignore_conflicts=True
+        )
+        self.imported['follow'] += len(follows)
+
+    def _resolve_users(self, usernames):
+        """Id пользователей по именам; недостающие создаются без пароля."""
+        missing = set(usernames) - set(self.users)
+        if missing:
+            User.objects.bulk_create([
+                User(username=name, password=make_password(None))
+                for name in missing
+            ], ignore_conflicts=True)
+            self.users.update(User.objects.filter(
+                username__in=missing
+            ).values_list('username', 'id'))
+        return self.users
+
+    def _resolve_groups(self, slugs):
+        """Id групп по slug; недостающие создаются с названием из slug."""
+        missing = set(slugs) - set(self.groups)
+        if missing:
+            Group.objects.bulk_create([
+                Group(title=slug, slug=slug, description='')
+                for slug in missing
+            ], ignore_conflicts=True)
+            self.groups.update(Group.objects.filter(
+                slug__in=missing
+            ).values_list('slug', 'id'))
+        return self.groups
+
+    def _image(self, name):
+        """Копирует картинку из ``media_dir`` в хранилище постов."""
+        if not name or not self.media_dir:
+            return name or ''
+        source = os.path.join(self.media_dir, name)
+        if not os.path.isfile(source):
+            return name
+        storage = Post._meta.get_field('image').storage
+        with open(source, 'rb') as file:
+            return storage.save(name, File(file))
+
+    @staticmethod
+    def _date(value):
+        """Дата из выгрузки; ``None``, если её не разобрать."""
+        if not value:
+            return timezone.now()
+        try:
+            parsed = parse_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if parsed is None:
+            return None
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed, timezone.utc)
+        return parsed
+
+    @staticmethod
+    def _reset_sequences():
+        """Явные id постов сдвигают счётчики последовательностей.
+
+        Выполняется под той же блокировкой, что и вставка пачки.
+        """
+        statements = connection.ops.sequence_reset_sql(no_style(), [Post])
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
@@ -1,6 +1,6 @@
 # posts/urls.py
 from django.urls import path
-from . import views
+from . import api, feeds, views
 
 app_name = 'posts'
 
@@ -10,12 +10,29 @@ urlpatterns = [
     path('', views.index, name='main'),
     path('group/<slug>/', views.group_posts, name='url_group'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path('profile/<str:username>/posts.ndjson',
+         views.profile_export,
+         name='profile_export'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment/',
          views.add_comment,
          name='add_comment'),
+    path('posts/<int:post_id>/comments/',
+         views.post_comments,
+         name='post_comments'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search_posts, name='search'),
+    path('feeds/atom/', feeds.latest_posts, name='atom_index'),
+    path('group/<slug>/atom/', feeds.group_posts, name='atom_group'),
+    path('profile/<str:username>/atom/',
+         feeds.author_posts,
+         name='atom_profile'),
+    path('api/posts/', api.index, name='api_index'),
+    path('api/group/<slug>/', api.group_posts, name='api_group'),
+    path('api/profile/<str:username>/', api.profile, name='api_profile'),
+    path('api/follow/', api.follow_index, name='api_follow_index'),
+    path('api/posts/<int:post_id>/', api.post_detail, name='api_post_detail'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -1,35 +1,63 @@
+from django.http import (Http404, HttpResponseBadRequest, JsonResponse,
+                         StreamingHttpResponse)
 from django.shortcuts import redirect, render
-from .models import Follow, Post, Group, User, Comment
-from django.core.paginator import Paginator
+from .models import Follow, Post, Group, User
 from django.shortcuts import get_object_or_404
+from django.core.paginator import Paginator
 from .forms import PostForm, CommentForm
+from .paginators import CursorPaginator, paginate, uses_cursor
+from . import (conditions, counters, feed_cache, search, timeline,
+               transfer)
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.views.decorators.http import condition
 
-
-POSTS_PER_PAGE = 10
+from core import stampede
 
 
+POSTS_PER_PAGE = 10
+# Число постов на главной пересчитывается по поколению лент, а срок
+# только страхует от рассинхронизации. Число прежнего поколения не
+# отдаётся: с ним фрагмент страницы закэшировался бы под новым поколением
+# с неверной пагинацией.
+INDEX_COUNT_TIMEOUT = 300
+COMMENTS_PER_PAGE = 20
+
+
+@condition(
+    etag_func=conditions.feed_etag,
+    last_modified_func=conditions.feed_last_modified,
+)
 def index(request):
 
-    posts = Post.objects.all()
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    generation = feed_cache.get_generation()
+    posts = Post.objects.for_feed()
+    count = None
+    # Курсорному режиму число постов не нужно.
+    if not uses_cursor(request):
+        count = stampede.get_or_compute(
+            'posts:index_count', Post.objects.count, INDEX_COUNT_TIMEOUT,
+            version=generation, stale=False,
+        )
+    page_obj = paginate(request, posts, POSTS_PER_PAGE, count)
     context = {
         'page_obj': page_obj,
+        'feed_generation': generation,
     }
 
     return render(request, 'posts/index.html', context)
 
 
+@condition(
+    etag_func=conditions.feed_etag,
+    last_modified_func=conditions.feed_last_modified,
+)
 def group_posts(request, slug):
 
     group = get_object_or_404(Group, slug=slug)
     title = f'Записи сообщества {group.title}'
-    posts = group.posts.all()
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = group.posts.for_feed()
+    page_obj = paginate(request, posts, POSTS_PER_PAGE)
 
     context = {
         'group': group,
@@ -39,24 +67,27 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@condition(
+    etag_func=conditions.profile_etag,
+    last_modified_func=conditions.feed_last_modified,
+)
 def profile(request, username):
 
-    author = get_object_or_404(User, username=username)
-    posts = Post.objects.filter(author=author)
-    cnt_posts = posts.count()
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    author = conditions.profile_author(request, username)
+    if author is None:
+        raise Http404
+    author_counters = counters.for_user(author)
+    posts = Post.objects.filter(author=author).for_feed()
+    page_obj = paginate(request, posts, POSTS_PER_PAGE)
 
     if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user,
-            author=author) or None
+        following = conditions.is_following(request, author)
     else:
         following = None
 
     context = {
-        'cnt_posts': cnt_posts,
+        'cnt_posts': author_counters.posts_count,
+        'counters': author_counters,
         'author': author,
         'page_obj': page_obj,
         'following': following,
@@ -64,12 +95,39 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+@login_required
+def profile_export(request, username):
+    '''Все посты автора одной выгрузкой NDJSON'''
+    author = get_object_or_404(User, username=username)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        values, backwards = CursorPaginator(
+            Post.objects.all(), 1
+        ).decode_cursor(cursor)
+        if values is None or backwards:
+            return HttpResponseBadRequest('Неверный курсор')
+    response = StreamingHttpResponse(
+        transfer.stream_author_posts(author, cursor),
+        content_type='application/x-ndjson; charset=utf-8',
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{author.username}-posts.ndjson"'
+    )
+    return response
+
+
+@condition(
+    etag_func=conditions.post_etag,
+    last_modified_func=conditions.post_last_modified,
+)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.for_feed().select_related('author__counters'),
+        id=post_id
+    )
     form = CommentForm(request.POST or None)
-    comments = Comment.objects.filter(post=get_object_or_404(Post, id=post_id))
-    posts_author = Post.objects.filter(author=post.author)
-    cnt_posts = posts_author.count()
+    comments = comments_page(post.comments, request.GET.get('comments'))
+    cnt_posts = counters.for_user(post.author).posts_count
     context = {
         'post': post,
         'form': form,
@@ -79,7 +137,55 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+def comments_page(comments, cursor):
+    """Порция комментариев по курсору, от старых к новым."""
+    paginator = CursorPaginator(
+        comments.select_related('author'),
+        COMMENTS_PER_PAGE,
+        ordering=('created', 'id'),
+    )
+    return paginator.get_page(cursor)
+
+
+def post_comments(request, post_id):
+    '''Следующая порция комментариев: HTML-фрагмент или JSON'''
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    comments = comments_page(post.comments, request.GET.get('cursor'))
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.id,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created.isoformat(),
+                }
+                for comment in comments
+            ],
+            'next_cursor': comments.next_cursor,
+        })
+    context = {
+        'post': post,
+        'comments': comments,
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
+def search_posts(request):
+    '''Поиск по тексту постов, лучшие совпадения первыми'''
+    query = request.GET.get('q', '').strip()
+    posts = search.search_posts(Post.objects.for_feed(), query)
+    paginator = Paginator(posts, POSTS_PER_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
 
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -95,10 +201,11 @@ def post_create(request):
 
 
 @login_required
+@transaction.atomic
 def post_edit(request, post_id):
 
     post = get_object_or_404(Post, id=post_id)
-    if request.user == post.author:
+    if request.user.id == post.author_id:
         form = PostForm(
             request.POST or None,
             files=request.FILES or None,
@@ -118,6 +225,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -133,14 +241,8 @@ def add_comment(request, post_id):
 def follow_index(request):
     '''Отображение постов подписанных авторов '''
     title = 'Новые посты ваших авторов'
-    follow_author = Follow.objects.filter(user=request.user).values_list(
-        'author_id',
-        flat=True
-    )
-    posts = Post.objects.filter(author_id__in=follow_author)
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = timeline.get_posts(request.user).for_feed()
+    page_obj = paginate(request, posts, POSTS_PER_PAGE)
     context = {
         'title': title,
         'page_obj': page_obj,
@@ -149,18 +251,17 @@ def follow_index(request):
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     '''Подписаться на автора'''
     author = get_object_or_404(User, username=username)
     if request.user != author:
-        Follow.objects.get_or_create(
-            user=get_object_or_404(User, username=request.user),
-            author=get_object_or_404(User, username=username)
-        )
+        Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('posts:profile', username=username)
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     '''Дизлайк, отписка'''
     author = get_object_or_404(User, username=username)
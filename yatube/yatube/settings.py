@@ -13,6 +13,9 @@ STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Тесты пишут метрики во временный каталог, а не в METRICS_DIR.
+TEST_RUNNER = 'core.runner.TestRunner'
+
 ALLOWED_HOSTS = [
     'localhost',
     '127.0.0.1',
@@ -38,6 +41,8 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 MIDDLEWARE = [
+    'core.middleware.ProfilingMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -73,15 +78,53 @@ TEMPLATES = [
     },
 ]
 
+# Компилировать все шаблоны из TEMPLATES_DIR при старте WSGI-воркера.
+# Имеет смысл только с кэширующим загрузчиком, как в settings_production.
+TEMPLATE_WARMUP = False
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    },
+    # Реплика для чтения. Локально это копия db.sqlite3, которую
+    # обновляет ``manage.py sync_replicas``; в тестах — та же база.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db_replica.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+
+# Прагмы, которые core.sqlite выполняет на каждом новом соединении.
+# Боевые значения — в yatube/settings_production.py.
+SQLITE_PRAGMAS = {}
+
+# Алиасы реплик, с которых читаются модели DATABASE_REPLICATED_APPS.
+# Пустой список отправляет все запросы в default.
+DATABASE_REPLICAS = []
+DATABASE_REPLICATED_APPS = ('posts',)
+
+# Сколько секунд после записи пользователь читает из основной базы.
+REPLICA_PIN_COOKIE = 'replica_pin'
+REPLICA_PIN_SECONDS = 10
+
+# Сессии читаются из кэша, а в базу идут только при записи; пользователь
+# сессии тоже берётся из кэша, пока его не сохранят заново.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+# ModelBackend остаётся вторым, пока живы сессии, созданные до появления
+# кэширующего бэкенда: Django не пускает сессию, чей бэкенд не в списке.
+# Новые входы проходят через первый бэкенд.
+AUTHENTICATION_BACKENDS = [
+    'core.auth.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+AUTH_USER_CACHE_TIMEOUT = 300
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -119,3 +162,73 @@ LOGIN_REDIRECT_URL = 'posts:main'
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+
+# Keyset-пагинация лент по (pub_date, id) вместо номеров страниц.
+POSTS_CURSOR_PAGINATION = False
+
+# Сколько секунд хранить готовые JSON-ответы лент API.
+API_CACHE_TIMEOUT = 300
+
+# Карточки постов сбрасываются сменой ключа при правке поста;
+# таймаут только вычищает карточки удалённых и изменённых постов.
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Готовый XML Atom-лент сбрасывается новым постом своей области;
+# таймаут только ограничивает жизнь ключей, которые больше не спросят.
+ATOM_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Предрассчитанные ленты подписок: длина ленты и порог подписчиков,
+# после которого посты автора подмешиваются при чтении, а не рассылаются.
+TIMELINE_LENGTH = 800
+TIMELINE_FANOUT_LIMIT = 5000
+TIMELINE_PULL_CACHE_TIMEOUT = 300
+
+# Миниатюры готовит фоновый обработчик (manage.py thumbnail_worker);
+# пока их нет, шаблоны показывают исходную картинку.
+THUMBNAIL_BACKEND = 'posts.thumbnails.PregeneratingBackend'
+THUMBNAIL_ASYNC = True
+THUMBNAIL_WORKERS = 2
+THUMBNAIL_MAX_ATTEMPTS = 3
+THUMBNAIL_CLAIM_TIMEOUT = 600
+THUMBNAIL_QUEUED_TIMEOUT = 300
+
+# Обёртки над шаблонами и кешем на весь процесс: без них /metrics не
+# считает попадания в кеш, а лог не видит время рендеринга. Разбивка
+# времени запроса в заголовке Server-Timing — только для отладки. Доля
+# запросов пишется в лог yatube.profiling (JSON), доля снимается под
+# cProfile.
+PROFILING_INSTRUMENTATION = True
+PROFILING_SERVER_TIMING = False
+PROFILING_LOG_RATE = 0.0
+PROFILING_CPROFILE_RATE = 0.0
+PROFILING_CPROFILE_DIR = os.path.join(BASE_DIR, 'profiles')
+
+# Метрики /metrics: каждый процесс пишет снимок в свой файл в METRICS_DIR
+# не чаще раза в METRICS_FLUSH_INTERVAL секунд. Отдаются только адресам
+# из METRICS_ALLOWED_IPS (за прокси это адрес прокси, поэтому снаружи
+# /metrics стоит закрыть ещё и на нём).
+METRICS_DIR = os.path.join(BASE_DIR, 'metrics')
+METRICS_FLUSH_INTERVAL = 5
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'yatube.profiling': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'yatube.warmup': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
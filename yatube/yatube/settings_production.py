@@ -0,0 +1,64 @@
+"""Боевой профиль: SQLite и шаблоны.
+
+Подключается через ``DJANGO_SETTINGS_MODULE=yatube.settings_production``.
+WAL позволяет читать во время записи, ``busy_timeout`` заставляет
+писателей ждать блокировку, а не падать с ``database is locked``, а
+постоянные соединения не открывают базу и не выполняют прагмы заново на
+каждый запрос. Выигрыш показывает ``manage.py benchmark_sqlite``.
+
+Шаблоны загружаются кэширующим загрузчиком и компилируются при старте
+воркера; время старта и первых запросов показывает
+``manage.py startup_report``.
+
+Кэш общий для всех воркеров: файл SQLite на одной машине, memcached на
+нескольких. Сравнение с LocMemCache — ``manage.py benchmark_cache``.
+"""
+import copy
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES, TEMPLATES
+
+DEBUG = False
+
+# Копии, чтобы не менять настройки базового модуля, если он загружен.
+TEMPLATES = copy.deepcopy(TEMPLATES)
+DATABASES = copy.deepcopy(DATABASES)
+
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+TEMPLATES[0]['OPTIONS']['context_processors'].remove(
+    'django.template.context_processors.debug'
+)
+TEMPLATE_WARMUP = True
+
+for database in DATABASES.values():
+    database['CONN_MAX_AGE'] = 600
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    # В WAL при NORMAL сбой питания может потерять последние коммиты,
+    # но не повредить базу; fsync остаётся только на контрольных точках.
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    # Отрицательный размер — в килобайтах: 64 МБ страничного кэша.
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+# На нескольких машинах вместо файла нужен сервер, например:
+# {'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+#  'LOCATION': '127.0.0.1:11211'}
+CACHES = {
+    'default': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+}